@@ -0,0 +1,171 @@
+import hashlib
+import threading
+from array import array
+from itertools import product
+from sqlalchemy import text
+from ._grading import OPTION_CODES, OPTION_LETTERS
+
+# Packed storage for Submission.answers, shared by db_app.py and the
+# serverless api/submit.py. A stored answer vector is one base-5 digit per
+# question (0 = not answered, 1-4 = A-D), three digits to a byte (5**3 = 125),
+# in the order of an answer layout: the test's question ids in paper order at
+# the time of submission. Layouts are immutable rows shared by every
+# submission against the same paper, so a 200-question paper packs into 67
+# bytes instead of ~2.4 KB of JSON, and submissions made before a paper was
+# replaced still decode to their original question ids. Answer dicts that
+# don't fit a layout (unknown question ids, values other than A-D) stay JSON.
+
+ANSWERS_PER_BYTE = 3
+
+# byte -> the three answers it holds, as letters (' ' when unanswered) and as option codes
+_LETTER_TRIPLES = tuple(
+    ''.join(OPTION_LETTERS[code] or ' ' for code in (low, middle, high))
+    for high, middle, low in product(range(5), repeat=3)
+)
+_CODE_TRIPLES = tuple(
+    (low, middle, high) for high, middle, low in product(range(5), repeat=3)
+)
+
+LAYOUT_SQL = text('SELECT test_id, question_ids FROM answer_layout WHERE id = :id')
+
+LAYOUT_BY_DIGEST_SQL = text('SELECT id FROM answer_layout WHERE test_id = :tid AND digest = :digest')
+
+INSERT_LAYOUT_SQL = text(
+    'INSERT INTO answer_layout (test_id, digest, question_ids, created_at) '
+    'VALUES (:tid, :digest, :question_ids, CURRENT_TIMESTAMP) '
+    'ON CONFLICT (test_id, digest) DO NOTHING'
+)
+
+def packed_size(question_count):
+    return -(-question_count // ANSWERS_PER_BYTE)
+
+def pack_answers(layout, answers):
+    """Pack an {question id: option} dict against a layout, or None if it holds anything a layout can't"""
+    if not isinstance(answers, dict):
+        return None
+    positions = layout.positions
+    codes = bytearray(packed_size(len(layout.question_keys)) * ANSWERS_PER_BYTE)
+    for question_key, answer in answers.items():
+        position = positions.get(question_key)
+        if position is None or answer.__class__ is not str or answer not in OPTION_CODES:
+            return None
+        codes[position] = OPTION_CODES[answer]
+    return bytes(map(lambda low, middle, high: low + 5 * middle + 25 * high, codes[0::3], codes[1::3], codes[2::3]))
+
+def unpack_letters(codes, question_count):
+    """Packed answers as a fixed-width string in layout order: A-D, or a space if unanswered"""
+    return ''.join(map(_LETTER_TRIPLES.__getitem__, codes))[:question_count]
+
+def unpack_answers(layout, codes):
+    """Packed answers back into the {question id: option} dict that was submitted"""
+    letters = unpack_letters(codes, len(layout.question_keys))
+    return {question_key: letter for question_key, letter in zip(layout.question_keys, letters) if letter != ' '}
+
+def unpack_code_matrix(blobs, question_count):
+    """Packed answers of one layout as a candidates x questions uint8 matrix of OPTION_CODES"""
+    import numpy as np
+    table = np.asarray(_CODE_TRIPLES, dtype=np.uint8)
+    raw = np.frombuffer(b''.join(blobs), dtype=np.uint8)
+    return table[raw].reshape(len(blobs), -1)[:, :question_count]
+
+class AnswerLayout:
+    __slots__ = ('id', 'test_id', 'question_ids', 'question_keys', 'positions')
+
+    def __init__(self, layout_id, test_id, question_ids):
+        self.id = layout_id
+        self.test_id = test_id
+        self.question_ids = question_ids                                 # array('i'), paper order
+        self.question_keys = tuple(str(qid) for qid in question_ids)     # keys used in submitted answers
+        self.positions = {question_key: i for i, question_key in enumerate(self.question_keys)}
+
+def layout_digest(question_ids):
+    return hashlib.sha1(question_ids.tobytes()).hexdigest()
+
+class AnswerLayoutCache:
+    """Layouts by id, plus the layout of each test's current answer key; layouts never change once stored"""
+
+    def __init__(self):
+        self._layouts = {}      # layout id -> AnswerLayout
+        self._current = {}      # test id -> (AnswerKey, AnswerLayout)
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0  # for /metrics; unlocked, so approximate under threads
+
+    def get(self, session, layout_id):
+        layout = self._layouts.get(layout_id)
+        if layout is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            test_id, question_ids = session.execute(LAYOUT_SQL, {'id': layout_id}).one()
+            layout = AnswerLayout(layout_id, test_id, array('i', bytes(question_ids)))
+            self._layouts[layout_id] = layout
+        return layout
+
+    def for_key(self, engine, key):
+        """The stored layout matching an answer key, created if needed
+
+        Runs in its own short transaction on engine, so a layout is never cached
+        from a caller's transaction that later rolls back.
+        """
+        current = self._current.get(key.test_id)
+        if current is not None and current[0] is key:
+            self.hits += 1
+            return current[1]
+
+        with self._lock:
+            self.misses += 1
+            question_ids = array('i', key.question_ids)
+            params = {'tid': key.test_id, 'digest': layout_digest(question_ids)}
+            with engine.begin() as connection:
+                layout_id = connection.execute(LAYOUT_BY_DIGEST_SQL, params).scalar()
+                if layout_id is None:
+                    connection.execute(INSERT_LAYOUT_SQL, dict(params, question_ids=question_ids.tobytes()))
+                    layout_id = connection.execute(LAYOUT_BY_DIGEST_SQL, params).scalar()
+            layout = self._layouts.setdefault(layout_id, AnswerLayout(layout_id, key.test_id, question_ids))
+            self._current[key.test_id] = (key, layout)
+        return layout
+
+    def invalidate(self, test_id):
+        self._current.pop(int(test_id), None)
+
+answer_layouts = AnswerLayoutCache()
+
+def pack_for_key(engine, key, answers):
+    """(answer_layout_id, answer_codes) for an answers dict graded against key, or None to keep it as JSON"""
+    layout = answer_layouts.for_key(engine, key)
+    codes = pack_answers(layout, answers)
+    return (layout.id, codes) if codes is not None else None
+
+def stored_answer_matrix(session, rows, key, json_matrix):
+    """Answer matrix laid out like key for stored (answers, answer_layout_id, answer_codes) rows
+
+    JSON rows are decoded by json_matrix(blobs, key); packed rows are grouped by
+    layout and decoded with one table lookup, their columns mapped onto the key.
+    """
+    import numpy as np
+    matrix = np.zeros((len(rows), key.total_questions), dtype=np.uint8)
+    json_rows, json_blobs, packed = [], [], {}
+    for i, (answers, layout_id, codes) in enumerate(rows):
+        if codes is None:
+            json_rows.append(i)
+            json_blobs.append(answers)
+        else:
+            packed.setdefault(layout_id, ([], []))
+            packed[layout_id][0].append(i)
+            packed[layout_id][1].append(codes)
+
+    if json_rows:
+        matrix[json_rows] = json_matrix(json_blobs, key)
+    for layout_id, (indices, blobs) in packed.items():
+        layout = answer_layouts.get(session, layout_id)
+        decoded = unpack_code_matrix(blobs, len(layout.question_keys))
+        if layout.question_keys == key.question_keys:
+            matrix[indices] = decoded
+            continue
+        # An older paper: carry over the questions still on it
+        columns = [(j, key.positions[question_key]) for j, question_key in enumerate(layout.question_keys)
+                   if question_key in key.positions]
+        if columns:
+            source, target = zip(*columns)
+            matrix[np.ix_(indices, target)] = decoded[:, source]
+    return matrix
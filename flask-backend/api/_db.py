@@ -1,11 +1,64 @@
 import os
+import threading
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 DATABASE_URL = os.environ.get('DATABASE_URL') or 'sqlite:///exam_app.db'
 
+# Pool tuning. A warm serverless instance serves one request at a time, so a
+# small pool is enough; connections are pinged before use and recycled before
+# the server or a proxy drops them while the instance is frozen.
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '2'))
+MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '3'))
+POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', '10'))
+POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '300'))
+
+# Set DB_PGBOUNCER=1 when DATABASE_URL points at pgbouncer (e.g. Neon's
+# "-pooler" host). Pooling is then left to pgbouncer: no connections are held
+# between invocations, so frozen instances don't pin server slots.
+PGBOUNCER = os.environ.get('DB_PGBOUNCER', '').lower() in ('1', 'true', 'yes')
+
+_engine = None
+_Session = None
+_lock = threading.Lock()
+
+def engine_options(url=DATABASE_URL, pgbouncer=PGBOUNCER):
+    if url.startswith('sqlite'):
+        return {}
+
+    options = {
+        'pool_pre_ping': True,
+        'connect_args': {
+            'application_name': 'rompitoe-api',
+            'keepalives': 1,
+            'keepalives_idle': 30,
+            'keepalives_interval': 10,
+            'keepalives_count': 3
+        }
+    }
+    if pgbouncer:
+        options['poolclass'] = NullPool
+        options['pool_pre_ping'] = False
+    else:
+        options.update({
+            'pool_size': POOL_SIZE,
+            'max_overflow': MAX_OVERFLOW,
+            'pool_timeout': POOL_TIMEOUT,
+            'pool_recycle': POOL_RECYCLE
+        })
+    return options
+
+def get_engine():
+    # Created once per process and reused across warm invocations
+    global _engine, _Session
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                _engine = create_engine(DATABASE_URL, **engine_options())
+                _Session = sessionmaker(bind=_engine)
+    return _engine
+
 def get_session():
-    # Create a new engine per invocation for serverless environments
-    engine = create_engine(DATABASE_URL, connect_args={})
-    Session = sessionmaker(bind=engine)
-    return Session(), engine
+    engine = get_engine()
+    return _Session(), engine
@@ -0,0 +1,424 @@
+import json
+import threading
+from array import array
+from itertools import repeat
+from sqlalchemy import text
+
+# The one grading engine. db_app.py (submit, reports, regrade) and the
+# serverless api/submit.py both grade through it, so every entry point agrees
+# on scores, pass/fail and labels. Per-candidate grading is plain Python over
+# an answer key compiled once per (test, paper_version, policy); batch
+# regrading runs the same rules over a NumPy answer matrix (NumPy is imported
+# only when a batch is scored, keeping serverless cold starts lean).
+
+OPTION_CODES = {'A': 1, 'B': 2, 'C': 3, 'D': 4}
+OPTION_LETTERS = ('', 'A', 'B', 'C', 'D')
+
+DEFAULT_PASS_PERCENTAGE = 40
+
+KEY_SQL = text(
+    'SELECT s.id, s.name, s.marks, s.negative_marks, '
+    'q.id, q.section_order, q.question_text, q.correct_answer, q.marks, q.negative_marks, '
+    'q.option_a, q.option_b, q.option_c, q.option_d '
+    'FROM section s LEFT OUTER JOIN question q ON q.section_id = s.id '
+    'WHERE s.test_id = :tid '
+    'ORDER BY s."order", s.id, q.section_order, q.id'
+)
+
+class GradingPolicy:
+    """Per-test grading rules, stored as JSON in test.grading_policy
+
+    pass_percentage: minimum score_percentage that passes
+    negative_marks: whole marks deducted for each wrong answer
+    section_weights: {section name: whole marks per correct answer}, default 1
+
+    Marks set on a question or section in the uploaded paper take precedence.
+    """
+    __slots__ = ('pass_percentage', 'negative_marks', 'section_weights')
+
+    def __init__(self, pass_percentage=DEFAULT_PASS_PERCENTAGE, negative_marks=0, section_weights=None):
+        self.pass_percentage = pass_percentage
+        self.negative_marks = negative_marks
+        self.section_weights = section_weights or {}
+
+    @classmethod
+    def parse(cls, source):
+        """Build a policy from a dict or its JSON text (None means the defaults); raises ValueError if malformed"""
+        if source is None or source == '':
+            return cls()
+        if isinstance(source, str):
+            source = json.loads(source)
+        if not isinstance(source, dict):
+            raise ValueError('grading_policy must be an object')
+        unknown = set(source) - set(cls.__slots__)
+        if unknown:
+            raise ValueError(f'Unknown grading_policy fields: {", ".join(sorted(unknown))}')
+
+        pass_percentage = source.get('pass_percentage', DEFAULT_PASS_PERCENTAGE)
+        if isinstance(pass_percentage, bool) or not isinstance(pass_percentage, (int, float)) or not 0 <= pass_percentage <= 100:
+            raise ValueError('pass_percentage must be a number from 0 to 100')
+
+        negative_marks = source.get('negative_marks', 0)
+        if isinstance(negative_marks, bool) or not isinstance(negative_marks, int) or negative_marks < 0:
+            raise ValueError('negative_marks must be a whole number of marks, 0 or more')
+
+        section_weights = source.get('section_weights') or {}
+        if not isinstance(section_weights, dict) or not all(
+            isinstance(weight, int) and not isinstance(weight, bool) and weight >= 1
+            for weight in section_weights.values()
+        ):
+            raise ValueError('section_weights must map section names to whole marks of 1 or more')
+
+        return cls(pass_percentage, negative_marks, {str(name): weight for name, weight in section_weights.items()})
+
+    def to_dict(self):
+        return {
+            'pass_percentage': self.pass_percentage,
+            'negative_marks': self.negative_marks,
+            'section_weights': dict(self.section_weights)
+        }
+
+    def to_json(self):
+        """Canonical JSON for storage, or None for the default policy"""
+        if self.to_dict() == GradingPolicy().to_dict():
+            return None
+        return json.dumps(self.to_dict(), sort_keys=True, separators=(',', ':'))
+
+class AnswerKey:
+    def __init__(self, test_id, version, section_names, section_offsets,
+                 question_ids, question_numbers, question_texts, correct_options,
+                 policy=None, policy_source=None, question_marks=None, question_penalties=None, question_options=None):
+        self.test_id = test_id
+        self.version = version
+        self.policy = policy or GradingPolicy()
+        self.policy_source = policy_source          # test.grading_policy the key was built with
+        self.section_names = section_names          # tuple, one per section
+        self.section_offsets = section_offsets      # array('i'), len(sections) + 1
+        self.question_ids = question_ids            # array('i'), paper order
+        self.question_keys = tuple(str(qid) for qid in question_ids)  # keys used in submitted answers
+        self.positions = {question_key: i for i, question_key in enumerate(self.question_keys)}
+        self.question_numbers = question_numbers    # array('i') of section_order
+        self.question_texts = question_texts        # tuple
+        self.question_options = question_options or tuple({} for _ in question_ids)  # {letter: option text}, for results
+        self.correct_options = correct_options      # bytes of OPTION_CODES, 0 if unknown
+        self.correct_letters = tuple(OPTION_LETTERS[code] for code in correct_options)
+
+        # Marks per question, resolved once here so grading stays a single
+        # pass: a correct answer earns the question's marks and a wrong one
+        # costs its penalty. question_marks/question_penalties hold the
+        # paper's own values (None where unset), which fall back to the policy.
+        self.marks = array('i')
+        self.penalties = array('i')
+        self.section_marks = array('i')
+        for index, section_name in enumerate(section_names):
+            weight = self.policy.section_weights.get(section_name, 1)
+            start, end = section_offsets[index], section_offsets[index + 1]
+            for i in range(start, end):
+                marks = question_marks[i] if question_marks else None
+                penalty = question_penalties[i] if question_penalties else None
+                self.marks.append(weight if marks is None else marks)
+                self.penalties.append(self.policy.negative_marks if penalty is None else penalty)
+            self.section_marks.append(sum(self.marks[start:end]))
+        self.total_marks = sum(self.section_marks)
+
+    @property
+    def total_questions(self):
+        return len(self.question_ids)
+
+def load_answer_key(session, test_id, version, policy_source=None):
+    """Compile a test's answer key (with per-question marks and penalties) from a single ordered query"""
+    rows = session.execute(KEY_SQL, {'tid': test_id}).fetchall()
+
+    section_names = []
+    section_offsets = array('i')
+    question_ids = array('i')
+    question_numbers = array('i')
+    question_texts = []
+    question_options = []
+    correct_options = bytearray()
+    question_marks = []
+    question_penalties = []
+    current_section_id = None
+
+    for (section_id, section_name, section_marks, section_penalty, question_id, section_order,
+         question_text, correct_answer, marks, penalty, option_a, option_b, option_c, option_d) in rows:
+        if section_id != current_section_id:
+            current_section_id = section_id
+            section_names.append(section_name)
+            section_offsets.append(len(question_ids))
+        if question_id is None:
+            continue
+        question_ids.append(question_id)
+        question_numbers.append(section_order or 0)
+        question_texts.append(question_text)
+        question_options.append({'A': option_a, 'B': option_b, 'C': option_c, 'D': option_d})
+        correct_options.append(OPTION_CODES.get(correct_answer, 0))
+        question_marks.append(section_marks if marks is None else marks)
+        question_penalties.append(section_penalty if penalty is None else penalty)
+
+    section_offsets.append(len(question_ids))
+
+    return AnswerKey(test_id, version, tuple(section_names), section_offsets,
+                     question_ids, question_numbers, tuple(question_texts), bytes(correct_options),
+                     GradingPolicy.parse(policy_source), policy_source, question_marks, question_penalties,
+                     tuple(question_options))
+
+class AnswerKeyCache:
+    def __init__(self):
+        self._keys = {}  # test_id -> AnswerKey
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0  # for /metrics; unlocked, so approximate under threads
+
+    def peek(self, test_id):
+        return self._keys.get(test_id)
+
+    def get(self, session, test_id, version, policy_source=None):
+        """Return the cached key for the test's current version and policy, compiling it on a miss"""
+        version = version or 0
+        key = self._keys.get(test_id)
+        if key is not None and key.version == version and key.policy_source == policy_source:
+            self.hits += 1
+            return key
+
+        with self._lock:
+            key = self._keys.get(test_id)
+            if key is None or key.version != version or key.policy_source != policy_source:
+                self.misses += 1
+                key = load_answer_key(session, test_id, version, policy_source)
+                self._keys[test_id] = key
+            else:
+                self.hits += 1
+        return key
+
+    def invalidate(self, test_id):
+        self._keys.pop(int(test_id), None)
+
+answer_key_cache = AnswerKeyCache()
+
+# ============================================================================
+# Grading one candidate
+# ============================================================================
+
+def performance_label(percentage):
+    return 'Strong' if percentage >= 70 else ('Average' if percentage >= 50 else 'Needs Improvement')
+
+def pass_status(percentage, policy):
+    return 'Pass' if percentage >= policy.pass_percentage else 'Fail'
+
+def question_status(answer, is_correct):
+    return 'correct' if is_correct else ('incorrect' if answer else 'not_attempted')
+
+def percentage_of(points, total):
+    return round(points / total * 100, 2) if total > 0 else 0
+
+class Grade:
+    """One candidate's answers graded against a key; lists are in paper order"""
+    __slots__ = ('answers', 'correct', 'marked', 'points', 'attempted', 'correct_count', 'marked_count',
+                 'section_points', 'section_attempted', 'section_correct')
+
+    def percentage(self, key):
+        return percentage_of(self.points, key.total_marks)
+
+def grade_answers(key, answers, question_states=None):
+    """Grade a {question id: option} dict; anything other than A-D counts as not attempted"""
+    get_answer = answers.get
+    get_state = (question_states or {}).get
+    question_keys = key.question_keys
+    correct_letters = key.correct_letters
+    marks = key.marks
+    penalties = key.penalties
+    offsets = key.section_offsets
+
+    grade = Grade()
+    grade.answers = given = []
+    grade.correct = correct = []
+    grade.marked = marked = []
+    grade.section_points = []
+    grade.section_attempted = []
+    grade.section_correct = []
+
+    for section_index in range(len(key.section_names)):
+        section_points = section_attempted = section_correct = 0
+        for i in range(offsets[section_index], offsets[section_index + 1]):
+            question_key = question_keys[i]
+            answer = get_answer(question_key)
+            if answer.__class__ is not str or answer not in OPTION_CODES:
+                answer = None
+            is_correct = answer is not None and answer == correct_letters[i]
+            if answer is not None:
+                section_attempted += 1
+                if is_correct:
+                    section_correct += 1
+                    section_points += marks[i]
+                else:
+                    section_points -= penalties[i]
+            given.append(answer)
+            correct.append(is_correct)
+
+            state = get_state(question_key)
+            marked.append(bool(state.get('marked_for_review', False)) if state.__class__ is dict else False)
+
+        grade.section_points.append(section_points)
+        grade.section_attempted.append(section_attempted)
+        grade.section_correct.append(section_correct)
+
+    grade.points = sum(grade.section_points)
+    grade.attempted = sum(grade.section_attempted)
+    grade.correct_count = sum(grade.section_correct)
+    grade.marked_count = sum(marked)
+    return grade
+
+def overall_summary(key, grade, stored=None):
+    """The overall_summary block; stored (points, total, percentage) replace the freshly graded scores"""
+    score_points, score_total, score_percentage = stored or (grade.points, key.total_marks, grade.percentage(key))
+    return {
+        'score_points': score_points,
+        'score_total': score_total,
+        'score_percentage': score_percentage,
+        'pass_status': pass_status(score_percentage, key.policy),
+        'accuracy': percentage_of(grade.correct_count, grade.attempted),
+        'total_questions': key.total_questions,
+        'attempted': grade.attempted,
+        'not_attempted': key.total_questions - grade.attempted,
+        'correct': grade.correct_count,
+        'incorrect': grade.attempted - grade.correct_count,
+        'marked_for_review': grade.marked_count
+    }
+
+def section_analysis(key, grade):
+    sections = []
+    for index, section_name in enumerate(key.section_names):
+        score_percentage = percentage_of(grade.section_points[index], key.section_marks[index])
+        sections.append({
+            'section_name': section_name,
+            'total_questions': key.section_offsets[index + 1] - key.section_offsets[index],
+            'attempted': grade.section_attempted[index],
+            'correct': grade.section_correct[index],
+            'incorrect': grade.section_attempted[index] - grade.section_correct[index],
+            'score_percentage': score_percentage,
+            'performance': performance_label(score_percentage)
+        })
+    return sections
+
+def submission_result(key, grade, submission_id, test_id, test_name, test_duration_minutes):
+    """The /submit response body for a graded submission"""
+    question_details = []
+    for section_index, section_name in enumerate(key.section_names):
+        for i in range(key.section_offsets[section_index], key.section_offsets[section_index + 1]):
+            answer = grade.answers[i]
+            options = key.question_options[i]
+            question_details.append({
+                'question_number': key.question_numbers[i],
+                'section_name': section_name,
+                'question_text': key.question_texts[i],
+                'options': dict(options),
+                'correct_answer': key.correct_letters[i],
+                'correct_answer_text': options.get(key.correct_letters[i], ''),
+                'your_answer': answer,
+                'your_answer_text': options.get(answer, '') if answer else None,
+                'is_correct': grade.correct[i],
+                'is_attempted': answer is not None,
+                'is_marked_for_review': grade.marked[i],
+                'status': question_status(answer, grade.correct[i])
+            })
+
+    return {
+        'message': 'Exam submitted successfully',
+        'submission_id': submission_id,
+        'test_id': test_id,
+        'test_name': test_name,
+        'test_duration_minutes': test_duration_minutes,
+        'overall_summary': overall_summary(key, grade),
+        'section_analysis': section_analysis(key, grade),
+        'question_details': question_details
+    }
+
+# ============================================================================
+# Batch grading (regrades and aggregates)
+# ============================================================================
+# Answers are decoded into a candidates x questions uint8 matrix of
+# OPTION_CODES and scored against the key with NumPy broadcasting, applying
+# the same marks and penalties as grade_answers.
+
+_option_code_table = None
+
+def _code_table():
+    global _option_code_table
+    if _option_code_table is None:
+        import numpy as np
+        table = np.zeros(256, dtype=np.uint8)
+        for letter, code in OPTION_CODES.items():
+            table[ord(letter)] = code
+        _option_code_table = table
+    return _option_code_table
+
+def build_answer_matrix(answer_blobs, key):
+    """Decode JSON answer dicts into a uint8 matrix laid out like the answer key"""
+    import numpy as np
+    keys = key.question_keys
+    width = len(keys)
+    column_of = None
+    buffer = bytearray(len(answer_blobs) * width)
+
+    for i, blob in enumerate(answer_blobs):
+        try:
+            answers = json.loads(blob)
+        except (TypeError, ValueError):
+            answers = None
+        if not answers:
+            continue
+
+        # Fast path: every answer is a single ASCII letter, so the row can be
+        # gathered and joined in C; anything else falls back to a per-item loop
+        try:
+            row = ''.join(map(answers.get, keys, repeat(' '))).encode('ascii')
+        except (TypeError, UnicodeEncodeError):
+            row = None
+        if row is not None and len(row) == width:
+            buffer[i * width:(i + 1) * width] = row
+            continue
+
+        if column_of is None:
+            column_of = {qkey: j for j, qkey in enumerate(keys)}
+        for qkey, option in answers.items():
+            j = column_of.get(qkey)
+            if j is not None and isinstance(option, str) and option in OPTION_CODES:
+                buffer[i * width + j] = ord(option)
+
+    raw = np.frombuffer(bytes(buffer), dtype=np.uint8).reshape(len(answer_blobs), width)
+    return _code_table()[raw]
+
+def score_answer_matrix(matrix, key):
+    """Score every row of an answer matrix against the key in one pass
+
+    Returns (points, attempted, section_correct, section_attempted) where the
+    section arrays are candidates x sections.
+    """
+    import numpy as np
+    key_codes = np.frombuffer(key.correct_options, dtype=np.uint8)
+    correct = (matrix == key_codes[np.newaxis, :]) & (key_codes != 0)[np.newaxis, :]
+    attempted = matrix != 0
+
+    offsets = np.asarray(key.section_offsets, dtype=np.intp)
+    # np.add.reduceat misreports empty sections, so only reduce over non-empty ones
+    non_empty = offsets[:-1] < offsets[1:]
+    starts = offsets[:-1][non_empty]
+
+    def per_section(flags):
+        totals = np.zeros((flags.shape[0], len(non_empty)), dtype=np.int32)
+        if len(starts):
+            totals[:, non_empty] = np.add.reduceat(flags, starts, axis=1, dtype=np.int32)
+        return totals
+
+    section_correct = per_section(correct)
+    section_attempted = per_section(attempted)
+
+    marks = np.frombuffer(key.marks, dtype=np.int32).astype(np.int64)
+    penalties = np.frombuffer(key.penalties, dtype=np.int32).astype(np.int64)
+    if marks.min(initial=1) == marks.max(initial=1) and penalties.min(initial=0) == penalties.max(initial=0):
+        # Uniform marking: the section counts already hold everything needed
+        wrong = (section_attempted - section_correct).sum(axis=1, dtype=np.int64)
+        points = section_correct.sum(axis=1, dtype=np.int64) * marks.max(initial=1) - wrong * penalties.max(initial=0)
+    else:
+        points = correct.astype(np.int64) @ marks - (attempted & ~correct).astype(np.int64) @ penalties
+    return points, section_attempted.sum(axis=1), section_correct, section_attempted
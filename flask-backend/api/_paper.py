@@ -0,0 +1,108 @@
+import hashlib
+import json
+import threading
+from datetime import datetime
+from sqlalchemy import text
+
+# Shared by api/questions.py and the Flask get_questions route so both
+# deployments serve the same answer-free paper, built with one ordered query
+# and cached as pre-serialized JSON per (test, paper_version).
+
+PAPER_SQL = text(
+    'SELECT s.id, s.name, q.id, q.section_order, q.question_text, '
+    'q.option_a, q.option_b, q.option_c, q.option_d '
+    'FROM section s LEFT OUTER JOIN question q ON q.section_id = s.id '
+    'WHERE s.test_id = :tid '
+    'ORDER BY s."order", s.id, q.section_order, q.id'
+)
+
+TEST_SQL = text(
+    'SELECT id, name, description, duration_minutes, created_at, is_active, paper_version, grading_policy '
+    'FROM test WHERE id = :tid'
+)
+
+def _isoformat(value):
+    # Raw SQLite rows hand back timestamps as strings
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.isoformat() if value is not None else None
+
+def test_info(row):
+    """Test.to_dict() for a row fetched with TEST_SQL"""
+    return {
+        'id': row[0],
+        'name': row[1],
+        'description': row[2],
+        'duration_minutes': row[3],
+        'created_at': _isoformat(row[4]),
+        'is_active': bool(row[5])
+    }
+
+def encode_json(payload):
+    # Byte-for-byte what Flask's jsonify produces (sorted keys, compact, ASCII)
+    return json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8') + b'\n'
+
+class CompiledPaper:
+    def __init__(self, test_id, version, body, has_sections):
+        self.test_id = test_id
+        self.version = version
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.has_sections = has_sections
+
+def compile_paper(session, test, version):
+    """Build the answer-free paper for a test dict with a single ordered query"""
+    rows = session.execute(PAPER_SQL, {'tid': test['id']}).fetchall()
+
+    sections = []
+    current = None
+    for section_id, section_name, question_id, section_order, question_text, a, b, c, d in rows:
+        if current is None or current['id'] != section_id:
+            current = {
+                'id': section_id,
+                'name': section_name,
+                'questions': []
+            }
+            sections.append(current)
+        if question_id is not None:
+            current['questions'].append({
+                'id': question_id,
+                'section_id': section_id,
+                'section_name': section_name,
+                'question_id': section_order,
+                'question': question_text,
+                'options': {'A': a, 'B': b, 'C': c, 'D': d}
+            })
+
+    body = encode_json({'test': test, 'sections': sections})
+    return CompiledPaper(test['id'], version, body, bool(sections))
+
+class PaperCache:
+    def __init__(self):
+        self._papers = {}  # test_id -> CompiledPaper
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0  # for /metrics; unlocked, so approximate under threads
+
+    def get(self, session, test, version):
+        """Return the cached paper for the test's current version, compiling it on a miss"""
+        version = version or 0
+        paper = self._papers.get(test['id'])
+        if paper is not None and paper.version == version:
+            self.hits += 1
+            return paper
+
+        with self._lock:
+            # Another request may have compiled it while we were waiting
+            paper = self._papers.get(test['id'])
+            if paper is None or paper.version != version:
+                self.misses += 1
+                paper = compile_paper(session, test, version)
+                self._papers[test['id']] = paper
+            else:
+                self.hits += 1
+        return paper
+
+    def invalidate(self, test_id):
+        self._papers.pop(int(test_id), None)
+
+paper_cache = PaperCache()
@@ -0,0 +1,77 @@
+import json
+from datetime import datetime
+from sqlalchemy import text
+
+# Per-test aggregates in test_stats, shared by db_app.py and the serverless
+# api/submit.py so both fold a new submission in the same way: the score
+# histogram, the score slot counts rankings are built from, and the running
+# count, sum, min and max. Aggregates missing or built for another paper
+# version are left alone here; the Flask app rebuilds them when it next reads
+# them.
+
+SCORE_HISTOGRAM_BUCKETS = 10  # 10-point buckets; 100% lands in the last one
+RANK_SLOTS_PER_POINT = 100  # score_percentage is stored to 2 decimals
+RANK_SLOTS = 100 * RANK_SLOTS_PER_POINT + 1
+
+STATS_SQL = (
+    'SELECT paper_version, submission_count, participant_count, score_sum, score_min, score_max, '
+    'histogram, score_counts, section_correct, section_attempted '
+    'FROM test_stats WHERE test_id = :tid'
+)
+
+ADD_PARTICIPANT_SQL = text(
+    'INSERT INTO test_participant (test_id, user_id) VALUES (:tid, :uid) '
+    'ON CONFLICT (test_id, user_id) DO NOTHING RETURNING user_id'
+)
+
+UPDATE_STATS_SQL = text(
+    'UPDATE test_stats SET submission_count = :submission_count, participant_count = :participant_count, '
+    'score_sum = :score_sum, score_min = :score_min, score_max = :score_max, histogram = :histogram, '
+    'score_counts = :score_counts, section_correct = :section_correct, section_attempted = :section_attempted, '
+    'updated_at = :updated_at WHERE test_id = :tid'
+)
+
+def score_bucket(percentage):
+    return min(max(int(percentage // 10), 0), SCORE_HISTOGRAM_BUCKETS - 1)
+
+def score_slot(percentage):
+    return min(max(int(round(percentage * RANK_SLOTS_PER_POINT)), 0), RANK_SLOTS - 1)
+
+def count_scores(histogram, score_counts, percentages):
+    """Add percentages to a histogram list and a {score slot: count} dict in place"""
+    for percentage in percentages:
+        histogram[score_bucket(percentage)] += 1
+        slot = str(score_slot(percentage))
+        score_counts[slot] = score_counts.get(slot, 0) + 1
+
+def fold_submission(session, key, user_id, percentage, grade):
+    """Add one submission stored in session's transaction to its test's aggregates
+
+    Returns False, changing nothing, when the test has no aggregates for key's
+    paper version; they are rebuilt from the stored submissions when next read.
+    """
+    stats_sql = STATS_SQL if session.bind.dialect.name == 'sqlite' else STATS_SQL + ' FOR UPDATE'
+    stats = session.execute(text(stats_sql), {'tid': key.test_id}).fetchone()
+    if stats is None or stats[0] != key.version or stats[7] is None:
+        return False
+
+    (_, submission_count, participant_count, score_sum, score_min, score_max,
+     histogram, score_counts, section_correct, section_attempted) = stats
+    histogram, score_counts = json.loads(histogram), json.loads(score_counts)
+    count_scores(histogram, score_counts, [percentage])
+    new_participant = session.execute(ADD_PARTICIPANT_SQL, {'tid': key.test_id, 'uid': user_id}).fetchone()
+
+    session.execute(UPDATE_STATS_SQL, {
+        'tid': key.test_id,
+        'submission_count': submission_count + 1,
+        'participant_count': participant_count + (1 if new_participant else 0),
+        'score_sum': score_sum + percentage,
+        'score_min': min(score_min, percentage) if score_min is not None else percentage,
+        'score_max': max(score_max, percentage) if score_max is not None else percentage,
+        'histogram': json.dumps(histogram),
+        'score_counts': json.dumps(score_counts),
+        'section_correct': json.dumps([a + b for a, b in zip(json.loads(section_correct), grade.section_correct)]),
+        'section_attempted': json.dumps([a + b for a, b in zip(json.loads(section_attempted), grade.section_attempted)]),
+        'updated_at': datetime.utcnow()
+    })
+    return True
@@ -3,13 +3,15 @@ import os
 import jwt
 from sqlalchemy import text
 from ._db import get_session
+from ._paper import TEST_SQL, paper_cache, test_info
 
 JWT_SECRET = os.environ.get('JWT_SECRET_KEY', 'dev-secret')
 JWT_ALGO = 'HS256'
 
 def handler(req):
     # Authenticate
-    auth = req.get('headers', {}).get('authorization') or req.get('headers', {}).get('Authorization')
+    headers = req.get('headers', {})
+    auth = headers.get('authorization') or headers.get('Authorization')
     if not auth or not auth.lower().startswith('bearer '):
         return {'statusCode': 401, 'body': json.dumps({'error': 'Authorization required'})}
     token = auth.split(None, 1)[1]
@@ -33,20 +35,25 @@ def handler(req):
             return {'statusCode': 404, 'body': json.dumps({'error': 'User not found'})}
 
         # Verify test exists
-        t = session.execute(text('SELECT id, name, description, duration_minutes, is_active FROM test WHERE id = :tid'), {'tid': test_id}).fetchone()
+        t = session.execute(TEST_SQL, {'tid': test_id}).fetchone()
         if not t:
             return {'statusCode': 404, 'body': json.dumps({'error': 'Test not found'})}
 
-        # Get sections
-        sections = []
-        sec_rows = session.execute(text('SELECT id, name FROM section WHERE test_id = :tid ORDER BY "order"'), {'tid': test_id}).fetchall()
-        for sec in sec_rows:
-            q_rows = session.execute(text('SELECT id, question_text, option_a, option_b, option_c, option_d FROM question WHERE section_id = :sid ORDER BY section_order'), {'sid': sec[0]}).fetchall()
-            questions = []
-            for q in q_rows:
-                questions.append({'id': q[0], 'question': q[1], 'options': {'A': q[2], 'B': q[3], 'C': q[4], 'D': q[5]}})
-            sections.append({'id': sec[0], 'name': sec[1], 'questions': questions})
-
-        return {'statusCode': 200, 'body': json.dumps({'test': {'id': t[0], 'name': t[1], 'duration_minutes': t[3]}, 'sections': sections}), 'headers': {'Content-Type': 'application/json'}}
+        # Whole paper in one joined query, cached per paper_version on warm instances
+        paper = paper_cache.get(session, test_info(t), t[6])
+        if not paper.has_sections:
+            return {'statusCode': 404, 'body': json.dumps({'error': 'No questions available for this test'})}
+
+        response_headers = {
+            'Content-Type': 'application/json',
+            'ETag': '"%s"' % paper.etag,
+            'Cache-Control': 'private, no-cache',
+            'X-Paper-Version': str(paper.version)
+        }
+        if_none_match = headers.get('if-none-match') or headers.get('If-None-Match') or ''
+        if paper.etag in if_none_match:
+            return {'statusCode': 304, 'body': '', 'headers': response_headers}
+
+        return {'statusCode': 200, 'body': paper.body.decode('utf-8'), 'headers': response_headers}
     finally:
         session.close()
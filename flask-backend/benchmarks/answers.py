@@ -0,0 +1,64 @@
+"""Stored size and decode cost of JSON vs packed submission answers.
+
+Packs random answer sets for a 200-question paper (api/_answers.py), checks
+they round-trip to the same dict, then compares bytes per submission, the
+dict decode behind Submission.to_dict, and building the answer matrix that
+regrades and analytics score:
+
+    cd flask-backend
+    python -m benchmarks.answers --candidates 20000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from array import array
+from collections import deque
+
+from api._answers import AnswerLayout, pack_answers, unpack_answers, unpack_code_matrix
+from api._grading import build_answer_matrix
+from benchmarks.grading import make_key, random_answers
+
+
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--candidates', type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(4)
+    key = make_key([50, 50, 60, 40])
+    layout = AnswerLayout(1, key.test_id, array('i', key.question_ids))
+    candidates = [random_answers(key, rng, junk=False) for _ in range(args.candidates)]
+    blobs = [json.dumps(answers) for answers in candidates]
+    packed = [pack_answers(layout, answers) for answers in candidates]
+
+    if any(unpack_answers(layout, codes) != answers for codes, answers in zip(packed, candidates)):
+        print('packed answers did not round-trip')
+        sys.exit(1)
+
+    json_bytes = sum(len(blob.encode('utf-8')) for blob in blobs) / len(blobs)
+    packed_bytes = sum(len(codes) for codes in packed) / len(packed)
+    print(f'stored bytes per submission   JSON {json_bytes:8.1f}   packed {packed_bytes:6.1f}')
+
+    # Decoded dicts are dropped right away so the timings aren't garbage collection
+    _, json_s = timed(lambda: deque(map(json.loads, blobs), maxlen=0))
+    _, packed_s = timed(lambda: deque((unpack_answers(layout, codes) for codes in packed), maxlen=0))
+    print(f'decode to dict, per row       JSON {json_s / len(blobs) * 1e6:6.1f} us  packed {packed_s / len(packed) * 1e6:6.1f} us')
+
+    json_matrix, json_s = timed(lambda: build_answer_matrix(blobs, key))
+    packed_matrix, packed_s = timed(lambda: unpack_code_matrix(packed, key.total_questions))
+    if not (json_matrix == packed_matrix).all():
+        print('answer matrices differ')
+        sys.exit(1)
+    print(f'answer matrix, {len(blobs)} rows    JSON {json_s * 1000:6.1f} ms  packed {packed_s * 1000:6.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Grading engine micro-benchmark and agreement check for 200-question papers.
+
+First checks the shared engine in api/_grading.py against hand-worked golden
+cases, and checks that per-candidate grading (what /submit and the serverless
+handler use) and batch matrix scoring (regrades) agree on random answer
+sets, including junk values, a weighted, negatively marked policy and
+per-question marks and penalties from the uploaded paper. Exits
+non-zero on any mismatch. Then times both paths:
+
+    cd flask-backend
+    python -m benchmarks.grading --candidates 5000 --repeat 2000
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from array import array
+
+from api._grading import (
+    AnswerKey, GradingPolicy, OPTION_CODES, build_answer_matrix, grade_answers,
+    overall_summary, score_answer_matrix, section_analysis, submission_result
+)
+
+
+def make_key(section_sizes, policy=None, seed=0, paper_marks=False):
+    rng = random.Random(seed)
+    names = tuple(f'Section {index + 1}' for index in range(len(section_sizes)))
+    offsets = array('i', [0])
+    for size in section_sizes:
+        offsets.append(offsets[-1] + size)
+    count = offsets[-1]
+    question_ids = array('i', range(1, count + 1))
+    numbers = array('i', [i - offsets[s] + 1 for s in range(len(section_sizes)) for i in range(offsets[s], offsets[s + 1])])
+    correct = bytes(rng.choice(list(OPTION_CODES.values())) for _ in range(count))
+    policy_source = policy.to_json() if policy else None
+    question_marks = question_penalties = None
+    if paper_marks:
+        # Some questions set their own marks/penalty, the rest fall back to the policy
+        question_marks = [rng.choice([None, 1, 2, 4]) for _ in range(count)]
+        question_penalties = [rng.choice([None, 0, 1, 2]) for _ in range(count)]
+    return AnswerKey(1, 0, names, offsets, question_ids, numbers,
+                     tuple(f'Question {i}' for i in question_ids), correct, policy, policy_source,
+                     question_marks, question_penalties)
+
+
+def random_answers(key, rng, junk=True):
+    answers = {}
+    for question_key in key.question_keys:
+        roll = rng.random()
+        if roll < 0.15:
+            continue
+        if junk and roll < 0.2:
+            answers[question_key] = rng.choice(['', 'a', 'E', None, 3, ['A']])
+        else:
+            answers[question_key] = rng.choice('ABCD')
+    return answers
+
+
+GOLDEN = [
+    # (policy, answers, expected overall_summary subset, expected section score_percentage)
+    (None, {'1': 'A', '2': 'B', '3': 'D', '4': 'C'},
+     {'score_points': 3, 'score_total': 5, 'score_percentage': 60.0, 'pass_status': 'Pass', 'attempted': 4, 'correct': 3, 'incorrect': 1, 'not_attempted': 1},
+     [66.67, 50.0]),
+    (None, {'1': 'A', '5': 'B', '2': '', '3': 'a'},
+     {'score_points': 1, 'score_total': 5, 'score_percentage': 20.0, 'pass_status': 'Fail', 'attempted': 2, 'correct': 1, 'incorrect': 1, 'not_attempted': 3},
+     [33.33, 0.0]),
+    (GradingPolicy(pass_percentage=50, negative_marks=1, section_weights={'Section 2': 4}),
+     {'1': 'A', '2': 'B', '3': 'D', '4': 'C', '5': 'D'},
+     {'score_points': 9, 'score_total': 11, 'score_percentage': 81.82, 'pass_status': 'Pass', 'attempted': 5, 'correct': 4, 'incorrect': 1},
+     [33.33, 100.0]),
+    (GradingPolicy(negative_marks=2), {'1': 'D', '2': 'D', '3': 'D', '4': 'A'},
+     {'score_points': -8, 'score_total': 5, 'score_percentage': -160.0, 'pass_status': 'Fail', 'correct': 0, 'incorrect': 4},
+     [-200.0, -100.0]),
+    # Question 1 is worth 4 and question 4 costs 3 when wrong; the rest use the policy
+    (GradingPolicy(negative_marks=1), {'1': 'A', '2': 'C', '4': 'A', '5': 'D'},
+     {'score_points': 1, 'score_total': 8, 'score_percentage': 12.5, 'pass_status': 'Fail', 'correct': 2, 'incorrect': 2},
+     [50.0, -100.0], ([4, None, None, None, None], [None, None, None, 3, None])),
+]
+
+
+def golden_key(policy, paper_marks=(None, None)):
+    # Section 1: questions 1-3 keyed A, B, C; Section 2: questions 4-5 keyed C, D
+    codes = bytes(OPTION_CODES[letter] for letter in 'ABCCD')
+    return AnswerKey(1, 0, ('Section 1', 'Section 2'), array('i', [0, 3, 5]), array('i', [1, 2, 3, 4, 5]),
+                     array('i', [1, 2, 3, 1, 2]), ('q1', 'q2', 'q3', 'q4', 'q5'), codes, policy, None, *paper_marks)
+
+
+def check(samples):
+    failures = []
+    for index, (policy, answers, expected, sections, *paper_marks) in enumerate(GOLDEN):
+        key = golden_key(policy, *paper_marks)
+        grade = grade_answers(key, answers)
+        summary = overall_summary(key, grade)
+        got = {field: summary[field] for field in expected}
+        got_sections = [section['score_percentage'] for section in section_analysis(key, grade)]
+        if got != expected or got_sections != sections:
+            failures.append(f'golden case {index}: expected {expected} {sections}, got {got} {got_sections}')
+
+    rng = random.Random(1)
+    weighted = GradingPolicy(pass_percentage=35, negative_marks=1, section_weights={'Section 1': 4, 'Section 3': 2})
+    for policy, paper_marks in ((None, False), (weighted, False), (weighted, True)):
+        key = make_key([50, 50, 60, 40], policy, paper_marks=paper_marks)
+        candidates = [random_answers(key, rng) for _ in range(samples)]
+        points, attempted, section_correct, section_attempted = score_answer_matrix(
+            build_answer_matrix([json.dumps(answers) for answers in candidates], key), key
+        )
+        for row, answers in enumerate(candidates):
+            grade = grade_answers(key, answers)
+            batch = (int(points[row]), int(attempted[row]), section_correct[row].tolist(), section_attempted[row].tolist())
+            single = (grade.points, grade.attempted, grade.section_correct, grade.section_attempted)
+            if batch != single:
+                failures.append(f'batch/single mismatch (policy {policy and policy.to_dict()}, '
+                                f'paper marks {paper_marks}): {batch} != {single}')
+                break
+    return failures
+
+
+def timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--candidates', type=int, default=5000, help='answer sets for the batch timing')
+    parser.add_argument('--repeat', type=int, default=2000, help='single-candidate gradings to time')
+    parser.add_argument('--check-samples', type=int, default=300)
+    args = parser.parse_args()
+
+    failures = check(args.check_samples)
+    if failures:
+        print('\n'.join(failures))
+        sys.exit(1)
+    print(f'agreement check passed ({len(GOLDEN)} golden cases, {args.check_samples} random answer sets per marking scheme)')
+
+    rng = random.Random(2)
+    key = make_key([50, 50, 60, 40], GradingPolicy(negative_marks=1, section_weights={'Section 1': 4}), paper_marks=True)
+    answers = random_answers(key, rng, junk=False)
+    states = {question_key: {'marked_for_review': rng.random() < 0.1} for question_key in key.question_keys}
+
+    grade_us = timed(lambda: grade_answers(key, answers, states), args.repeat)
+    result_us = timed(lambda: submission_result(key, grade_answers(key, answers, states), 1, 1, 'Paper', 60), args.repeat)
+    print(f'grade_answers, 200 questions        median {grade_us:8.1f} us')
+    print(f'grade + /submit response body       median {result_us:8.1f} us')
+
+    blobs = [json.dumps(random_answers(key, rng, junk=False)) for _ in range(args.candidates)]
+    started = time.perf_counter()
+    score_answer_matrix(build_answer_matrix(blobs, key), key)
+    batch_s = time.perf_counter() - started
+    print(f'batch scoring, {args.candidates} candidates     {batch_s * 1000:8.1f} ms  ({batch_s / args.candidates * 1e6:.1f} us per candidate)')
+
+
+if __name__ == '__main__':
+    main()
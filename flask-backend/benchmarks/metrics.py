@@ -0,0 +1,189 @@
+"""Request metrics: what /metrics reports, and what recording them costs per request.
+
+Runs a scratch SQLite app through the test client and checks /metrics
+against the requests that were made: request counts per view, histogram
+buckets that add up to their _count, SQL statement totals equal to an
+independent count of the statements run, cache hit/miss counters, and
+totals from another server process added in. Exits non-zero on any
+mismatch. Then times the same requests with metrics on and off, round by
+round, times the metrics hooks on their own, and exits non-zero if the hooks
+cost more than the budget's share of a request:
+
+    cd flask-backend
+    python -m benchmarks.metrics --rounds 40 --requests 100 --budget-percent 1
+"""
+import argparse
+import math
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+# The module-level app is never used; don't require the Postgres driver
+os.environ.setdefault('FLASK_SQLALCHEMY_DATABASE_URI', 'sqlite://')
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import db_app
+
+SAMPLE_LINE = re.compile(r'^[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? -?[0-9.e+-]+$')
+
+
+def login(client, admin=False):
+    if admin:
+        response = client.post('/admin-login', json={'password': 'admin123'})
+    else:
+        response = client.post('/login', json={'user_id': 'test123', 'dob': '2000-01-01'})
+    return {'Authorization': 'Bearer ' + response.get_json()['token']}
+
+
+def parse(text):
+    """{(name, labels string): value} from a Prometheus text exposition, or raises on a malformed line"""
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith('#'):
+            continue
+        if not SAMPLE_LINE.match(line):
+            raise ValueError(f'malformed sample: {line!r}')
+        series, value = line.rsplit(' ', 1)
+        name, _, labels = series.partition('{')
+        samples[(name, labels.rstrip('}'))] = float(value)
+    return samples
+
+
+def check(client, user, admin):
+    failures = []
+
+    def expect(what, condition):
+        if not condition:
+            failures.append(what)
+
+    statements = [0]
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def count(*args):
+        statements[0] += 1
+
+    requests = [('/active-tests', user, 'get_active_tests'), ('/questions?test_id=1', user, 'get_questions'),
+                ('/tests', admin, 'get_tests')]
+    for path, headers, _ in requests * 5:
+        client.get(path, headers=headers)
+    client.get('/no-such-api-route', headers=user)
+    event.remove(Engine, 'before_cursor_execute', count)
+
+    samples = parse(client.get('/metrics').get_data(as_text=True))
+    prefix = db_app.METRICS_PREFIX
+    for _, _, view in requests:
+        expect(f'{view} requests_total', samples.get(
+            (f'{prefix}http_requests_total', f'view="{view}",method="GET",status="200"')) == 5)
+        for name, (bounds, _) in db_app.METRIC_HISTOGRAMS.items():
+            buckets = [samples.get((f'{prefix}{name}_bucket', f'view="{view}",le="{bound}"'))
+                       for bound in bounds + ('+Inf',)]
+            if name == 'http_request_size_bytes':
+                expect(f'{view} {name} absent for GETs', buckets[-1] is None)
+                continue
+            expect(f'{view} {name} buckets', None not in buckets and buckets == sorted(buckets))
+            expect(f'{view} {name}_count', buckets[-1] == samples.get((f'{prefix}{name}_count', f'view="{view}"')) == 5)
+    sql_total = sum(samples[(f'{prefix}http_request_sql_statements_sum', f'view="{view}"')] for _, _, view in requests)
+    expect(f'SQL statements {sql_total:.0f} vs {statements[0]} run', sql_total == statements[0])
+    expect('paper cache hits', samples.get((f'{prefix}cache_requests_total', 'cache="paper",result="hit"'), 0) >= 4)
+    expect('processes', samples.get((f'{prefix}metrics_processes', '')) == 1)
+
+    # Another worker's totals are added in
+    db_app.metrics_store.write('another-worker', db_app.request_metrics.snapshot())
+    merged = parse(client.get('/metrics').get_data(as_text=True))
+    expect('merged processes', merged.get((f'{prefix}metrics_processes', '')) == 2)
+    expect('merged requests_total', merged.get(
+        (f'{prefix}http_requests_total', 'view="get_tests",method="GET",status="200"')) == 10)
+    return failures, math.ceil(statements[0] / (len(requests) * 5))
+
+
+def set_metrics(app, enabled):
+    app.config['METRICS_ENABLED'] = enabled
+    if event.contains(Engine, 'after_cursor_execute', db_app.time_sql_statement) != enabled:
+        (event.listen if enabled else event.remove)(Engine, 'after_cursor_execute', db_app.time_sql_statement)
+
+
+def timed_round(client, requests, count):
+    started = time.perf_counter()
+    for i in range(count):
+        path, headers = requests[i % len(requests)]
+        client.get(path, headers=headers).close()
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def hook_cost(app, headers, statements, repeat=5, number=5000):
+    """Microseconds per request spent in the metrics hooks and SQL listeners, best of repeat runs in a request context"""
+    response = app.response_class(b'x' * 1024)
+    runs = []
+    with app.test_request_context('/tests', headers=headers), db_app.db.engine.connect() as connection:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(number):
+                db_app.start_request_metrics()
+                for _ in range(statements):
+                    db_app.count_sql_statement(connection, None, None, None, None, False)
+                    db_app.time_sql_statement(connection, None, None, None, None, False)
+                db_app.record_request_metrics(response)
+            runs.append((time.perf_counter() - started) / number * 1e6)
+    return min(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=40, help='rounds, each timing requests with metrics on and off')
+    parser.add_argument('--requests', type=int, default=100, help='requests per round and setting')
+    parser.add_argument('--budget-percent', type=float, default=1.0, help='allowed hook cost, as a share of a request')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        app = db_app.create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(scratch, 'metrics.db'),
+            'SUBMIT_WRITE_BEHIND': False,
+            'SUBMIT_JOURNAL_PATH': os.path.join(scratch, 'journal', 'submissions.db'),
+            'METRICS_LOG_SAMPLE_RATE': 0.0
+        })
+        with app.app_context():
+            db_app.initialize_database()
+        client = app.test_client()
+        user, admin = login(client), login(client, admin=True)
+
+        failures, statements = check(client, user, admin)
+        if failures:
+            print('\n'.join(failures))
+            sys.exit(1)
+        print('metrics check passed')
+
+        # Sampled log lines are built and written as in production, to nowhere
+        app.config['METRICS_LOG_SAMPLE_RATE'] = 0.01
+        db_app.request_log.handlers[0].setStream(open(os.devnull, 'w'))
+
+        # Metrics off also drops the SQL timing listener, so the difference is everything metrics add.
+        # Each round times both, in alternating order.
+        requests = [('/active-tests', user), ('/questions?test_id=1', user), ('/tests', admin)]
+        timed_round(client, requests, args.requests)  # warm up
+        on, off = [], []
+        for round_number in range(args.rounds):
+            for enabled in ((False, True) if round_number % 2 else (True, False)):
+                set_metrics(app, enabled)
+                (on if enabled else off).append(timed_round(client, requests, args.requests))
+        set_metrics(app, True)
+        hook_us = hook_cost(app, admin, statements)
+
+    # Run-to-run noise on a busy machine is larger than the budget, so the budget applies to the hooks' own cost
+    on_us, off_us = statistics.median(on), statistics.median(off)
+    difference = statistics.median(metered - bare for metered, bare in zip(on, off))
+    overhead = hook_us / off_us * 100
+    print(f'per request   metrics off {off_us:7.1f} us   on {on_us:7.1f} us   median difference {difference:+.1f} us')
+    print(f'metrics hooks {hook_us:5.1f} us per request with {statements} SQL statements ({overhead:.2f}% of a request)')
+    if overhead > args.budget_percent:
+        print(f'over the {args.budget_percent}% budget')
+        sys.exit(1)
+    print(f'within the {args.budget_percent}% budget')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Query-plan regression check for the hot-path indexes.
+
+Builds a scratch database from the models, drops the indexes that schema
+migration 2 adds and applies the migrations (so the indexes are built the
+way an existing database gets them), loads sample rows, then EXPLAINs the
+queries behind /my-submissions, test analysis pages, leaderboards, the paper
+and answer key, /tests counts and /active-tests. Exits non-zero if a query
+does not use its index:
+
+    cd flask-backend
+    python -m benchmarks.query_plans
+    python -m benchmarks.query_plans --database-url postgresql://localhost/postgres
+
+On Postgres everything is created in a throwaway schema that is dropped
+afterwards, and sequential scans are disabled while explaining so the check
+does not depend on table sizes.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+# The module-level app is never used; don't require the Postgres driver
+os.environ.setdefault('FLASK_SQLALCHEMY_DATABASE_URI', 'sqlite://')
+
+from sqlalchemy import create_engine, func, select, text
+
+from api._grading import KEY_SQL
+from api._paper import PAPER_SQL
+from db_app import (
+    HOT_PATH_INDEXES, MIGRATIONS, Question, Section, Submission, Test, User, db, migrate
+)
+
+
+def scratch_engine(url):
+    """Engine on an empty scratch database (a Postgres schema, or a temporary SQLite file), and a cleanup callback"""
+    if url:
+        schema = f'plan_check_{uuid.uuid4().hex[:8]}'
+        admin = create_engine(url, isolation_level='AUTOCOMMIT')
+        with admin.connect() as connection:
+            connection.execute(text(f'CREATE SCHEMA {schema}'))
+        engine = create_engine(url, connect_args={'options': f'-csearch_path={schema}'})
+
+        def cleanup():
+            engine.dispose()
+            with admin.connect() as connection:
+                connection.execute(text(f'DROP SCHEMA {schema} CASCADE'))
+            admin.dispose()
+        return engine, cleanup
+
+    path = os.path.join(tempfile.mkdtemp(), 'plan_check.db')
+    engine = create_engine(f'sqlite:///{path}')
+
+    def cleanup():
+        engine.dispose()
+        os.remove(path)
+    return engine, cleanup
+
+
+def build(engine):
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for _, name in HOT_PATH_INDEXES:
+            connection.execute(text(f'DROP INDEX IF EXISTS {name}'))
+    applied = migrate(engine)
+    assert applied == [version for version, *_ in MIGRATIONS], applied
+
+
+def seed(engine, tests=20, users=300, sections=5, questions=40, submissions=3000):
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(Test.__table__.insert(), [
+            {'id': i, 'name': f'Test {i}', 'duration_minutes': 60, 'is_active': i == 1, 'created_at': now,
+             'paper_version': 0, 'enrollment_count': 0}
+            for i in range(1, tests + 1)
+        ])
+        connection.execute(User.__table__.insert(), [
+            {'id': i, 'user_id': f'user{i}', 'dob': '2000-01-01', 'name': f'User {i}', 'is_admin': False}
+            for i in range(1, users + 1)
+        ])
+        section_rows, question_rows = [], []
+        for test_id in range(1, tests + 1):
+            for order in range(1, sections + 1):
+                section_id = len(section_rows) + 1
+                section_rows.append({'id': section_id, 'name': f'Section {order}', 'test_id': test_id, 'order': order})
+                question_rows.extend(
+                    {'section_id': section_id, 'section_order': number, 'question_text': 'q',
+                     'option_a': 'a', 'option_b': 'b', 'option_c': 'c', 'option_d': 'd', 'correct_answer': 'A'}
+                    for number in range(1, questions + 1)
+                )
+        connection.execute(Section.__table__.insert(), section_rows)
+        connection.execute(Question.__table__.insert(), question_rows)
+        connection.execute(Submission.__table__.insert(), [
+            {'user_id': rng.randint(1, users), 'test_id': rng.randint(1, tests), 'answers': '{}',
+             'score_points': 0, 'score_total': 1, 'score_percentage': round(rng.uniform(0, 100), 2),
+             'submitted_at': now - timedelta(minutes=i)}
+            for i in range(submissions)
+        ])
+    with engine.begin() as connection:
+        connection.execute(text('ANALYZE'))
+
+
+def checks():
+    """(what, statement, indexes its plan must use), mirroring the application's queries"""
+    tests = select(Test.id).where(Test.id.in_([2, 3, 4])).subquery()
+    return [
+        ('/my-submissions', select(Submission).where(Submission.user_id == 7), ['ix_submission_user_test']),
+        ('test analysis page', select(Submission).where(Submission.test_id == 3).order_by(Submission.id).limit(50),
+         ['ix_submission_test_id']),
+        ('leaderboard', select(Submission).where(Submission.test_id == 3).order_by(
+            Submission.score_percentage.desc(), Submission.submitted_at, Submission.id
+        ).limit(10), ['ix_submission_test_score']),
+        ('answer key', KEY_SQL.bindparams(tid=3), ['ix_section_test_order', 'ix_question_section_order']),
+        ('paper', PAPER_SQL.bindparams(tid=3), ['ix_section_test_order', 'ix_question_section_order']),
+        ('/tests counts', select(tests.c.id, func.count(func.distinct(Section.id)), func.count(Question.id)).outerjoin(
+            Section, Section.test_id == tests.c.id
+        ).outerjoin(Question, Question.section_id == Section.id).group_by(tests.c.id),
+         ['ix_section_test_order', 'ix_question_section_order']),
+        ('/active-tests', select(Test).where(Test.is_active == True), ['ix_test_is_active']),  # noqa: E712
+    ]
+
+
+def explain(connection, statement):
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+    if connection.dialect.name == 'postgresql':
+        return '\n'.join(row[0] for row in connection.execute(text('EXPLAIN ' + sql)))
+    return '\n'.join(row[-1] for row in connection.execute(text('EXPLAIN QUERY PLAN ' + sql)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default=os.environ.get('PLAN_CHECK_DATABASE_URL'),
+                        help='postgresql://... to check against Postgres (default: a scratch SQLite file)')
+    parser.add_argument('--verbose', action='store_true', help='print every plan')
+    args = parser.parse_args()
+
+    engine, cleanup = scratch_engine(args.database_url)
+    failures = 0
+    try:
+        build(engine)
+        seed(engine)
+        with engine.connect() as connection:
+            if engine.dialect.name == 'postgresql':
+                connection.execute(text('SET enable_seqscan = off'))
+            for what, statement, indexes in checks():
+                plan = explain(connection, statement)
+                missing = [name for name in indexes if name not in plan]
+                failures += bool(missing)
+                print(f"{'FAIL' if missing else 'ok  '}  {what:<20} {', '.join(indexes)}")
+                if missing or args.verbose:
+                    print('      ' + plan.replace('\n', '\n      '))
+    finally:
+        cleanup()
+    print(f'{engine.dialect.name}: {failures} of {len(checks())} queries missed their index')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Per-request latency of the serverless session setup, before and after pooling.
+
+Runs a trivial query the way an api/ handler does, first building a new
+engine per request (the old get_session) and then through the shared pooled
+engine. Uses DATABASE_URL, so point it at the real Postgres to see the
+TCP+TLS setup cost:
+
+    cd flask-backend
+    DATABASE_URL=postgresql://... python -m benchmarks.serverless_db --requests 50
+"""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from api import _db
+
+
+def per_request_engine_session():
+    # The previous api/_db.get_session
+    engine = create_engine(_db.DATABASE_URL, connect_args={})
+    Session = sessionmaker(bind=engine)
+    return Session(), engine
+
+
+def measure(get_session, requests):
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        session, engine = get_session()
+        try:
+            session.execute(text('SELECT 1')).scalar()
+        finally:
+            session.close()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[max(int(len(timings) * 0.95) - 1, 0)]
+    print(f'{label:<22} median {statistics.median(timings):8.2f} ms   p95 {p95:8.2f} ms   max {timings[-1]:8.2f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f'DATABASE_URL scheme: {_db.DATABASE_URL.split(":", 1)[0]}, pgbouncer mode: {_db.PGBOUNCER}')
+    report('engine per request', measure(per_request_engine_session, args.requests))
+    report('pooled engine', measure(_db.get_session, args.requests))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Import-time budget for db_app, paid by every gunicorn worker and cold start.
+
+Imports db_app in fresh interpreters under `python -X importtime` and exits
+non-zero if the median import time is over budget, if a dependency only
+uploads, analytics or exports need (pandas, numpy, openpyxl, pyarrow) was
+imported, or if importing touched the database:
+
+    cd flask-backend
+    python -m benchmarks.startup --runs 5 --budget-ms 1500
+
+The app is pointed at a scratch SQLite file (FLASK_SQLALCHEMY_DATABASE_URI),
+so the Postgres driver import is not part of the measurement.
+"""
+import argparse
+import importlib.util
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFERRED_MODULES = ('pandas', 'numpy', 'openpyxl', 'pyarrow')
+
+
+def import_times(statement, env):
+    """[(depth, module, self us, cumulative us)] from `python -X importtime -c statement`"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            cwd=BACKEND, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(result.stderr)
+        sys.exit(1)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():
+            continue  # column header
+        rows.append(((len(name) - len(name.lstrip()) - 1) // 2, name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def direct_imports(rows, module):
+    """Modules first imported by module itself, with their cumulative times"""
+    children = []
+    for depth, name, _, cumulative in rows:
+        if depth == 0:
+            if name == module:
+                return children
+            children = []
+        elif depth == 1:
+            children.append((name, cumulative))
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to time')
+    parser.add_argument('--budget-ms', type=float, default=1500, help='allowed median import time of db_app')
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as scratch:
+        database = os.path.join(scratch, 'startup.db')
+        env = dict(os.environ,
+                   FLASK_SQLALCHEMY_DATABASE_URI=f'sqlite:///{database}',
+                   FLASK_SUBMIT_JOURNAL_PATH=os.path.join(scratch, 'journal', 'submissions.db'))
+        import_times('import db_app', env)  # warm the bytecode cache
+        runs = [import_times('import db_app', env) for _ in range(args.runs)]
+        if os.path.exists(database):
+            failures.append('importing db_app opened the database')
+        installed = [module for module in DEFERRED_MODULES if importlib.util.find_spec(module)]
+        deferred = import_times('import ' + ', '.join(installed), env) if installed else []
+
+    totals = [next(cumulative for _, name, _, cumulative in rows if name == 'db_app') / 1000 for rows in runs]
+    median_ms = statistics.median(totals)
+    imported = {name.split('.')[0] for rows in runs for _, name, _, _ in rows}
+    for module in DEFERRED_MODULES:
+        if module in imported:
+            failures.append(f'importing db_app imported {module}')
+    if median_ms > args.budget_ms:
+        failures.append(f'median import time {median_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget')
+
+    print(f'import db_app       median {median_ms:7.1f} ms  (min {min(totals):.1f}, max {max(totals):.1f}, {args.runs} runs)')
+    for name, cumulative in sorted(direct_imports(runs[0], 'db_app'), key=lambda child: -child[1])[:8]:
+        print(f'  {name:<30} {cumulative / 1000:7.1f} ms')
+    deferred_ms = sum(cumulative for depth, _, _, cumulative in deferred if depth == 0) / 1000
+    print(f"deferred until used {deferred_ms:7.1f} ms  ({', '.join(installed)})")
+
+    if failures:
+        print('\n'.join(failures))
+        sys.exit(1)
+    print(f'within the {args.budget_ms:.0f} ms budget')
+
+
+if __name__ == '__main__':
+    main()
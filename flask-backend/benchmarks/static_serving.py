@@ -0,0 +1,140 @@
+"""React build serving: old per-request filesystem lookups vs the indexed, precompressed layer.
+
+Copies build/ and static/ to a scratch folder, writes their .br/.gz copies
+(compress_frontend, what `flask --app db_app compress-build` runs) and checks
+what serve_react sends: decompressed bodies match the files, hashed assets
+are immutable, ETags revalidate to 304, client-side routes get index.html and
+a missing asset is a 404. Exits non-zero on any mismatch. Then times both
+handlers through the test client and compares bytes sent:
+
+    cd flask-backend
+    python -m benchmarks.static_serving --requests 2000
+"""
+import argparse
+import gzip
+import os
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# The app never touches the database here; don't require the Postgres driver
+os.environ.setdefault('FLASK_SQLALCHEMY_DATABASE_URI', 'sqlite://')
+
+from flask import Flask, jsonify, send_from_directory
+
+import db_app
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def legacy_app(build, static):
+    """serve_react as it was: Flask's static route plus abspath/exists checks on every request"""
+    app = Flask('legacy', static_folder=static)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve_react(path):
+        react_build = os.path.abspath(build)
+        if not os.path.exists(react_build):
+            return jsonify({'status': 'running'}), 200
+        if path:
+            file_path = os.path.join(react_build, path)
+            if os.path.exists(file_path):
+                return send_from_directory(react_build, path)
+        if os.path.exists(os.path.join(react_build, 'index.html')):
+            return send_from_directory(react_build, 'index.html')
+        return jsonify({'error': 'React build incomplete'}), 404
+
+    return app
+
+
+def decoded(response):
+    if response.content_encoding == 'br':
+        import brotli
+        return brotli.decompress(response.data)
+    if response.content_encoding == 'gzip':
+        return gzip.decompress(response.data)
+    return response.data
+
+
+def check(client, build):
+    index_html = open(os.path.join(build, 'index.html'), 'rb').read()
+    main_js = re.search(rb'src="/(static/js/main\.[0-9a-f]+\.js)"', index_html).group(1).decode()  # what browsers load first
+    main_js_body = open(db_app.frontend.assets[main_js].path, 'rb').read()
+    failures = []
+
+    def expect(what, condition):
+        if not condition:
+            failures.append(what)
+
+    for accept in (None, 'gzip', 'gzip, deflate, br'):
+        headers = {'Accept-Encoding': accept} if accept else {}
+        response = client.get('/' + main_js, headers=headers)
+        expect(f'{main_js} ({accept}) body', decoded(response) == main_js_body)
+        expect(f'{main_js} ({accept}) immutable', 'immutable' in response.headers.get('Cache-Control', ''))
+        revalidated = client.get('/' + main_js, headers=dict(headers, **{'If-None-Match': response.headers['ETag']}))
+        expect(f'{main_js} ({accept}) 304', revalidated.status_code == 304)
+        response.close()
+        revalidated.close()
+
+        for path in ('/', '/admin/tests/3'):
+            response = client.get(path, headers=headers)
+            expect(f'{path} ({accept}) index.html', response.status_code == 200 and decoded(response) == index_html)
+            expect(f'{path} ({accept}) no-cache', 'no-cache' in response.headers.get('Cache-Control', ''))
+
+    expect('missing asset 404', client.get('/static/js/main.00000000.js').status_code == 404)
+    return failures, main_js
+
+
+def timed(client, path, headers, repeat):
+    timings = []
+    sizes = set()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(path, headers=headers)
+        body = response.data
+        response.close()
+        timings.append((time.perf_counter() - started) * 1e6)
+        sizes.add(len(body))
+    return statistics.median(timings), max(sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000, help='requests per path and handler')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        build = shutil.copytree(os.path.join(BACKEND, 'build'), os.path.join(scratch, 'build'))
+        static = shutil.copytree(os.path.join(BACKEND, 'static'), os.path.join(scratch, 'static'))
+        roots = [(build, ''), (static, 'static/')]
+        files, sizes = db_app.compress_frontend(roots)
+        summary = ', '.join(f"{encoding or 'original'} {size:,}" for encoding, size in sizes.items())
+        print(f'precompressed {files} files: {summary} bytes')
+
+        app = db_app.create_app({
+            'REACT_BUILD_FOLDER': build,
+            'SUBMIT_WRITE_BEHIND': False,
+            'SUBMIT_JOURNAL_PATH': os.path.join(scratch, 'journal', 'submissions.db')
+        })
+        db_app.frontend.load(roots)
+        client = app.test_client()
+        failures, main_js = check(client, build)
+        if failures:
+            print('\n'.join(failures))
+            sys.exit(1)
+        print('serving check passed')
+
+        legacy = legacy_app(build, static).test_client()
+        browser = {'Accept-Encoding': 'gzip, deflate, br'}
+        for label, path in (('hashed asset', '/' + main_js), ('client-side route', '/admin/tests/3')):
+            old_us, old_bytes = timed(legacy, path, browser, args.requests)
+            new_us, new_bytes = timed(client, path, browser, args.requests)
+            print(f'{label:<18} old {old_us:7.1f} us {old_bytes:>9,} B   new {new_us:7.1f} us {new_bytes:>9,} B')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Fixtures shared by the tests: one scratch SQLite app with the sample users and test"""
+import json
+import os
+from contextlib import contextmanager
+
+# The module-level app is never used; don't require the Postgres driver
+os.environ.setdefault('FLASK_SQLALCHEMY_DATABASE_URI', 'sqlite://')
+
+import pytest
+from flask import has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import db_app
+
+
+def login(client, user_id='test123', dob='2000-01-01', admin=False):
+    """Authorization headers for a sample user, or for the default admin"""
+    if admin:
+        response = client.post('/admin-login', json={'password': 'admin123'})
+    else:
+        response = client.post('/login', json={'user_id': user_id, 'dob': dob})
+    assert response.status_code == 200, response.get_json()
+    return {'Authorization': 'Bearer ' + response.get_json()['token']}
+
+
+def flush_journal(app):
+    """Store every journaled submission now, including rows the flusher thread has leased"""
+    with app.app_context():
+        db_app.drain_submissions()
+
+
+@contextmanager
+def counting_statements():
+    """Count the SQL statements run on behalf of requests (not by the flusher threads) inside the block"""
+    counts = [0]
+
+    def count(*args):
+        if has_request_context():
+            counts[0] += 1
+
+    event.listen(Engine, 'before_cursor_execute', count)
+    try:
+        yield counts
+    finally:
+        event.remove(Engine, 'before_cursor_execute', count)
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    # One app per run: the flusher threads stay bound to the first app that serves a request
+    scratch = tmp_path_factory.mktemp('app')
+    app = db_app.create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(scratch / 'exam.db'),
+        'SUBMIT_WRITE_BEHIND': True,  # opt-in in production; on here so the journaled paths are covered
+        'SUBMIT_JOURNAL_PATH': str(scratch / 'journal' / 'submissions.db'),
+        'UPLOAD_FOLDER': str(scratch / 'uploads'),
+        'EXPORT_FOLDER': str(scratch / 'exports'),
+        'METRICS_LOG_SAMPLE_RATE': 0.0
+    })
+    with app.app_context():
+        db_app.initialize_database()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user_headers(client):
+    return login(client)
+
+
+@pytest.fixture
+def admin_headers(client):
+    return login(client, admin=True)
+
+
+@pytest.fixture
+def new_paper(app):
+    """new_paper(correct='ABCD') makes an active test open to everyone, one question per correct option.
+    Returns (test id, question ids in paper order)."""
+    def make(correct='ABCD', name='Scratch test'):
+        with app.app_context():
+            test = db_app.Test(name=name, description='', duration_minutes=60, is_active=True)
+            db_app.db.session.add(test)
+            db_app.db.session.flush()
+            section = db_app.Section(name='Section A', test_id=test.id, order=1)
+            db_app.db.session.add(section)
+            db_app.db.session.flush()
+            questions = [
+                db_app.Question(
+                    section_id=section.id, section_order=number, question_text=f'Question {number}',
+                    option_a='One', option_b='Two', option_c='Three', option_d='Four', correct_answer=option
+                )
+                for number, option in enumerate(correct, start=1)
+            ]
+            db_app.db.session.add_all(questions)
+            db_app.db.session.commit()
+            return test.id, [question.id for question in questions]
+    return make
+
+
+@pytest.fixture
+def serverless(app, monkeypatch):
+    """serverless(headers, body) calls api/submit.py's handler on the app's database; returns (status, body)"""
+    import api._db
+    import api.submit
+    monkeypatch.setattr(api._db, 'DATABASE_URL', app.config['SQLALCHEMY_DATABASE_URI'])
+    monkeypatch.setattr(api._db, '_engine', None)
+    monkeypatch.setattr(api._db, '_Session', None)
+    monkeypatch.setattr(api.submit, 'JWT_SECRET', app.config['JWT_SECRET_KEY'])
+    # Without a shared id sequence (SQLite), the handler's ids would collide with those the journal reserves
+    monkeypatch.setitem(app.config, 'SUBMIT_WRITE_BEHIND', False)
+
+    def call(headers, body):
+        response = api.submit.handler({'headers': headers, 'body': json.dumps(body)})
+        return response['statusCode'], json.loads(response['body'])
+    yield call
+    if api._db._engine is not None:
+        api._db._engine.dispose()
+    # Ids reserved before the handler's inserts may have been taken; reserve a new block past them
+    db_app.submission_ids = db_app.SubmissionIdAllocator()
+
+
+@pytest.fixture
+def paper(app):
+    """(test id, question ids in paper order) of the sample test"""
+    with app.app_context():
+        test = db_app.Test.query.order_by(db_app.Test.id).first()
+        key = db_app.get_answer_key(test)
+        return test.id, [int(question_id) for question_id in key.question_keys]
@@ -0,0 +1,60 @@
+"""/submit grades against the in-memory answer key index, rebuilt only when the paper changes"""
+from flask import has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import db_app
+
+
+def request_statements(client, *args, **kwargs):
+    """(response, SQL statements run for the request) of client.post(*args, **kwargs)"""
+    statements = []
+
+    def record(conn, cursor, statement, *rest):
+        if has_request_context():
+            statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', record)
+    try:
+        response = client.post(*args, **kwargs)
+    finally:
+        event.remove(Engine, 'before_cursor_execute', record)
+    return response, statements
+
+
+def test_key_layout(app, new_paper):
+    test_id, question_ids = new_paper('ABDC')
+    with app.app_context():
+        key = db_app.get_answer_key(db_app.db.session.get(db_app.Test, test_id))
+        assert key.question_keys == tuple(str(question_id) for question_id in question_ids)
+        assert key.correct_letters == ('A', 'B', 'D', 'C')
+        assert key.section_names == ('Section A',)
+        assert list(key.section_offsets) == [0, 4]
+        assert key.positions[str(question_ids[2])] == 2
+        # Cached until the paper version moves on
+        assert db_app.get_answer_key(db_app.db.session.get(db_app.Test, test_id)) is key
+
+
+def test_warm_submit_reads_no_questions(client, user_headers, new_paper):
+    test_id, question_ids = new_paper('AB')
+    body = {'test_id': test_id, 'answers': {str(question_ids[0]): 'A', str(question_ids[1]): 'C'}}
+    assert client.post('/submit', json=body, headers=user_headers).status_code == 200
+
+    response, statements = request_statements(client, '/submit', json=body, headers=user_headers)
+    assert response.status_code == 200
+    assert response.get_json()['overall_summary']['correct'] == 1
+    assert not [statement for statement in statements
+                if ' question' in statement.lower() or ' section' in statement.lower()]
+
+
+def test_key_rebuilt_when_the_paper_changes(app, client, user_headers, new_paper):
+    test_id, question_ids = new_paper('AB')
+    body = {'test_id': test_id, 'answers': {str(question_ids[0]): 'A', str(question_ids[1]): 'C'}}
+    assert client.post('/submit', json=body, headers=user_headers).get_json()['overall_summary']['correct'] == 1
+
+    # The key is corrected and the paper version bumped, as an upload does on any worker
+    with app.app_context():
+        db_app.db.session.get(db_app.Question, question_ids[1]).correct_answer = 'C'
+        db_app.bump_paper_version(db_app.db.session.get(db_app.Test, test_id))
+        db_app.db.session.commit()
+    assert client.post('/submit', json=body, headers=user_headers).get_json()['overall_summary']['correct'] == 2
@@ -0,0 +1,116 @@
+"""Server-side attempts: autosave, resuming across paper edits, submitting"""
+import threading
+
+import pytest
+
+import db_app
+
+
+def start(client, headers, test_id):
+    response = client.post('/attempts', json={'test_id': test_id}, headers=headers)
+    assert response.status_code in (200, 201), response.get_json()
+    return response.status_code, response.get_json()['attempt']
+
+
+def save(client, headers, attempt_id, answers=None, marked=()):
+    return client.patch(f'/attempts/{attempt_id}/answers', json={
+        'answers': {str(question_id): answer for question_id, answer in (answers or {}).items()},
+        'question_states': {str(question_id): {'marked_for_review': True} for question_id in marked}
+    }, headers=headers)
+
+
+def test_description_edit_keeps_the_open_attempt(client, user_headers, admin_headers, new_paper):
+    test_id, question_ids = new_paper('ABCD')
+    status, attempt = start(client, user_headers, test_id)
+    assert status == 201
+    assert save(client, user_headers, attempt['id'], {question_ids[0]: 'A', question_ids[1]: 'C'}).status_code == 200
+
+    response = client.put(f'/tests/{test_id}', json={'description': 'Now with a description'}, headers=admin_headers)
+    assert response.status_code == 200
+
+    assert save(client, user_headers, attempt['id'], {question_ids[2]: 'C'}).status_code == 200
+    status, resumed = start(client, user_headers, test_id)
+    assert (status, resumed['id']) == (200, attempt['id'])
+    assert resumed['answers'] == {str(question_ids[0]): 'A', str(question_ids[1]): 'C', str(question_ids[2]): 'C'}
+
+    response = client.post('/submit', json={'attempt_id': attempt['id']}, headers=user_headers)
+    assert response.status_code == 200, response.get_json()
+    assert [detail['status'] for detail in response.get_json()['question_details']] == [
+        'correct', 'incorrect', 'correct', 'not_attempted'
+    ]
+
+
+def test_changed_questions_carry_answers_by_question_id(app, client, user_headers, new_paper):
+    test_id, question_ids = new_paper('ABC')
+    _, attempt = start(client, user_headers, test_id)
+    save(client, user_headers, attempt['id'], {question_ids[0]: 'A', question_ids[2]: 'B'}, marked=[question_ids[1]])
+
+    # A question added at the top of the paper moves every other one down
+    with app.app_context():
+        test = db_app.db.session.get(db_app.Test, test_id)
+        section = test.sections[0]
+        db_app.db.session.add(db_app.Question(
+            section_id=section.id, section_order=0, question_text='New first question',
+            option_a='One', option_b='Two', option_c='Three', option_d='Four', correct_answer='D'
+        ))
+        db_app.bump_paper_version(test)
+        db_app.db.session.commit()
+        db_app.invalidate_test_caches(test_id)
+
+    status, resumed = start(client, user_headers, test_id)
+    assert (status, resumed['id']) == (200, attempt['id'])
+    assert resumed['answers'] == {str(question_ids[0]): 'A', str(question_ids[2]): 'B'}
+    assert resumed['question_states'] == {str(question_ids[1]): {'marked_for_review': True}}
+
+    response = client.post('/submit', json={'attempt_id': attempt['id']}, headers=user_headers)
+    assert response.status_code == 200, response.get_json()
+    statuses = {detail['question_text']: detail['status'] for detail in response.get_json()['question_details']}
+    assert statuses == {
+        'New first question': 'not_attempted', 'Question 1': 'correct', 'Question 2': 'not_attempted', 'Question 3': 'incorrect'
+    }
+
+
+def test_autosave_after_submit_is_rejected(client, user_headers, new_paper):
+    test_id, question_ids = new_paper()
+    _, attempt = start(client, user_headers, test_id)
+    assert save(client, user_headers, attempt['id'], {question_ids[0]: 'A'}).status_code == 200
+    assert client.post('/submit', json={'attempt_id': attempt['id']}, headers=user_headers).status_code == 200
+
+    response = save(client, user_headers, attempt['id'], {question_ids[1]: 'B'})
+    assert response.status_code == 409
+
+
+@pytest.fixture
+def buffer(tmp_path):
+    """A buffer of its own, out of reach of the app's flusher thread"""
+    return db_app.AutosaveBuffer(str(tmp_path / 'autosave.db'))
+
+
+def test_autosave_is_not_blocked_by_a_flush_in_progress(buffer):
+    buffer.add(1, [(10, 'A', None), (11, 'B', 1)])
+    applied = []
+
+    def apply(rows):
+        # Another request autosaves while this flush is writing to the database
+        thread = threading.Thread(target=buffer.add, args=(1, [(10, 'C', None)]))
+        thread.start()
+        thread.join(timeout=5)
+        assert not thread.is_alive(), 'autosave waited for the flush'
+        applied.extend(rows)
+
+    assert buffer.flush(apply) == 2
+    assert sorted(applied) == [(1, 10, 0, 'A', None), (1, 11, 0, 'B', 1)]
+    # The newer change to question 10 is still buffered; question 11's was applied and dropped
+    assert buffer.claim() == [(1, 10, 0, 'C', None, 2)]
+
+
+def test_failed_flush_keeps_the_changes(buffer):
+    buffer.add(1, [(10, 'A', None)])
+
+    def apply(rows):
+        raise RuntimeError('database unavailable')
+
+    with pytest.raises(RuntimeError):
+        buffer.flush(apply)
+    assert buffer.flush(lambda rows: None) == 1
+    assert not buffer.has_pending(1)
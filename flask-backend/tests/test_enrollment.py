@@ -0,0 +1,38 @@
+"""Enrollment adds each user once and counts only the rows it added"""
+import db_app
+
+
+def enroll(client, headers, test_id, user_ids, method='POST'):
+    response = client.open(f'/tests/{test_id}/enrollments', method=method, json={'user_ids': user_ids}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_enroll_skips_users_already_enrolled(client, admin_headers, new_paper):
+    test_id, _ = new_paper('AB')
+    first = enroll(client, admin_headers, test_id, ['u1', 'u2', 'u1', '', None])
+    assert first['added'] == 2
+    assert first['enrolled_users'] == ['u1', 'u2']
+
+    second = enroll(client, admin_headers, test_id, ['u2', 'u3'])
+    assert second['added'] == 1
+    assert sorted(second['enrolled_users']) == ['u1', 'u2', 'u3']
+    assert second['enrollment_count'] == 3
+
+    removed = enroll(client, admin_headers, test_id, ['u1', 'u4'], method='DELETE')
+    assert sorted(removed['enrolled_users']) == ['u2', 'u3']
+    assert enroll(client, admin_headers, test_id, ['u1'])['added'] == 1
+
+
+def test_enroll_users_tolerates_rows_added_concurrently(app, new_paper):
+    # Another request commits the same enrollment after this one has started
+    test_id, _ = new_paper('AB')
+    with app.app_context():
+        test = db_app.db.session.get(db_app.Test, test_id)
+        with db_app.db.engine.begin() as connection:
+            connection.execute(db_app.TestEnrollment.__table__.insert(), {'test_id': test_id, 'user_id': 'late'})
+
+        assert db_app.enroll_users(test, ['late', 'early']) == 1
+        db_app.db.session.commit()
+        assert test.enrollment_count == 2
+        assert sorted(db_app.get_enrolled_user_ids(test)) == ['early', 'late']
@@ -0,0 +1,89 @@
+"""Serving the React build: precompressed variants by Accept-Encoding, immutable hashed assets, index.html fallback"""
+import gzip
+import json
+import os
+
+import pytest
+
+import db_app
+
+SCRIPT = ('console.log("exam");\n' * 200).encode()
+INDEX = b'<!doctype html><title>Exam</title>' + b' ' * 2000
+
+
+@pytest.fixture
+def build(tmp_path, monkeypatch):
+    """A scratch React build, compressed with compress-build and served in place of the real one"""
+    folder = tmp_path / 'build'
+    (folder / 'static' / 'js').mkdir(parents=True)
+    (folder / 'static' / 'js' / 'main.0123abcd.js').write_bytes(SCRIPT)
+    (folder / 'robots.txt').write_bytes(b'User-agent: *\n')
+    (folder / 'index.html').write_bytes(INDEX)
+    (folder / 'asset-manifest.json').write_text(json.dumps({'files': {'main.js': '/static/js/main.0123abcd.js'}}))
+    roots = [(str(folder), ''), (str(tmp_path / 'static'), 'static/')]
+    db_app.compress_frontend(roots)
+
+    frontend = db_app.FrontendBuild()
+    frontend.load(roots)
+    monkeypatch.setattr(db_app, 'frontend', frontend)
+    return folder
+
+
+def decoded(response):
+    if response.content_encoding == 'br':
+        import brotli
+        return brotli.decompress(response.data)
+    if response.content_encoding == 'gzip':
+        return gzip.decompress(response.data)
+    return response.data
+
+
+@pytest.mark.parametrize('accept, encoding', [
+    ('br, gzip', 'br' if db_app.HAVE_BROTLI else 'gzip'),
+    ('gzip', 'gzip'),
+    ('gzip;q=0, br;q=0', None),
+    ('', None)
+])
+def test_hashed_asset_variants(client, build, accept, encoding):
+    response = client.get('/static/js/main.0123abcd.js', headers={'Accept-Encoding': accept})
+    assert response.status_code == 200
+    assert response.content_encoding == encoding
+    assert decoded(response) == SCRIPT
+    assert response.mimetype in ('application/javascript', 'text/javascript')
+    assert 'Accept-Encoding' in response.vary
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age == db_app.FRONTEND_IMMUTABLE_MAX_AGE
+
+    again = client.get('/static/js/main.0123abcd.js',
+                       headers={'Accept-Encoding': accept, 'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304
+
+
+def test_small_unhashed_file_revalidates(client, build):
+    response = client.get('/robots.txt', headers={'Accept-Encoding': 'br, gzip'})
+    assert response.status_code == 200
+    assert response.content_encoding is None  # too small to be worth a compressed copy
+    assert response.cache_control.no_cache
+    assert not response.cache_control.immutable
+
+
+def test_client_routes_get_index_html(client, build):
+    response = client.get('/results/42', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.content_encoding == 'gzip'
+    assert decoded(response) == INDEX
+    assert response.cache_control.no_cache
+    again = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304
+
+    assert client.get('/static/js/missing.js').status_code == 404
+
+
+def test_stale_variant_is_ignored(build):
+    # A compressed copy older than the file it was made from belongs to an older build
+    script = build / 'static' / 'js' / 'main.0123abcd.js'
+    stat = script.stat()
+    os.utime(script, (stat.st_atime, stat.st_mtime + 60))
+    frontend = db_app.FrontendBuild()
+    frontend.load([(str(build), '')])
+    assert frontend.assets['static/js/main.0123abcd.js'].variants == {}
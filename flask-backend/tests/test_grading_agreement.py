@@ -0,0 +1,67 @@
+"""Flask /submit, the stored /submission/<id> report and the serverless api/submit.py grade alike"""
+import pytest
+
+from conftest import flush_journal
+
+POLICIES = {
+    'default': None,
+    'negative marks': {'pass_percentage': 60, 'negative_marks': 1, 'section_weights': {'Section A': 2}}
+}
+
+# Per question of an 'ABCDABCD' paper: right, wrong, unanswered, not an option
+ANSWER_SETS = {
+    'all correct': 'ABCDABCD',
+    'mixed': 'AC DxBAD',
+    'none answered': '        ',
+    'all wrong': 'BADCBADC'
+}
+
+
+def your_answer(question, field='your_answer'):
+    # The report has always shown 'Not Attempted' where /submit has null
+    return None if question['status'] == 'not_attempted' else question[field]
+
+
+def summary(result):
+    overall = result['overall_summary']
+    return {
+        'scores': (overall['score_points'], overall['score_total'], overall['score_percentage'], overall['pass_status']),
+        'counts': (overall['total_questions'], overall['attempted'], overall['correct'], overall['incorrect']),
+        'sections': [
+            (section['section_name'], section['attempted'], section['correct'], section['score_percentage'])
+            for section in result['section_analysis']
+        ],
+        'questions': [
+            (question['question_number'], your_answer(question), question['correct_answer'], question['status'],
+             question['options'], question['correct_answer_text'], your_answer(question, 'your_answer_text'))
+            for question in result['question_details']
+        ]
+    }
+
+
+@pytest.mark.parametrize('policy', sorted(POLICIES))
+@pytest.mark.parametrize('answer_set', sorted(ANSWER_SETS))
+def test_submit_paths_agree(app, client, user_headers, admin_headers, new_paper, serverless, policy, answer_set):
+    test_id, question_ids = new_paper('ABCDABCD')
+    if POLICIES[policy]:
+        response = client.put(f'/tests/{test_id}', json={'grading_policy': POLICIES[policy]}, headers=admin_headers)
+        assert response.status_code == 200, response.get_json()
+    body = {
+        'test_id': test_id,
+        'answers': {str(question_id): answer for question_id, answer in zip(question_ids, ANSWER_SETS[answer_set])
+                    if answer != ' '}
+    }
+
+    flask_result = client.post('/submit', json=body, headers=user_headers).get_json()
+    status, serverless_result = serverless(user_headers, body)
+    assert status == 200, serverless_result
+    flush_journal(app)
+
+    expected = summary(flask_result)
+    assert [question['correct_answer_text'] for question in flask_result['question_details']] == \
+        [{'A': 'One', 'B': 'Two', 'C': 'Three', 'D': 'Four'}[option] for option in 'ABCDABCD']
+    assert summary(serverless_result) == expected
+    # Reports are built from the stored rows, so they check what each path stored too
+    for submission_id in (flask_result['submission_id'], serverless_result['submission_id']):
+        report = client.get(f'/submission/{submission_id}', headers=user_headers).get_json()
+        assert summary(report) == expected
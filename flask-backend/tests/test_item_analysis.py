@@ -0,0 +1,60 @@
+"""/tests/<id>/item-analysis against statistics worked out by hand"""
+import numpy as np
+import pytest
+
+import db_app
+
+# Five candidates on an 'ABCD' paper; ' ' is unanswered. Correct (1) or not (0) per question:
+#   ABCD  1 1 1 1  total 4
+#   ABCA  1 1 1 0        3
+#   ABAA  1 1 0 0        2
+#   ACAA  1 0 0 0        1
+#   B AA  0 0 0 0        0
+ANSWERS = ('ABCD', 'ABCA', 'ABAA', 'ACAA', 'B AA')
+
+# Totals have mean 2 and variance 2. p-values are 0.8, 0.6, 0.4, 0.2 and the item variances
+# p(1 - p) sum to 0.8, so KR-20 = 4/3 * (1 - 0.8 / 2) = 0.8.
+# Discrimination correlates each item with the total without it. For question 1 the rest scores
+# are (3, 2, 1, 0, 0): cov = 0.32, var = 1.36, var(item) = 0.16, r = 0.32 / sqrt(0.16 * 1.36) = 0.5145.
+# For question 2 the rest scores are (2, 1, 0, 0, 0): cov = 0.36, var = 0.64, r = 0.36 / sqrt(0.24 * 0.64) = 0.7206.
+# Questions 3 and 4 mirror questions 2 and 1.
+P_VALUES = [0.8, 0.6, 0.4, 0.2]
+DISCRIMINATION = [0.5145, 0.7206, 0.7206, 0.5145]
+
+
+def test_item_analysis_matches_hand_computed_values(app, client, user_headers, admin_headers, new_paper):
+    test_id, question_ids = new_paper('ABCD')
+    for answers in ANSWERS:
+        body = {'test_id': test_id, 'answers': {str(question_id): answer
+                                                for question_id, answer in zip(question_ids, answers) if answer != ' '}}
+        assert client.post('/submit', json=body, headers=user_headers).status_code == 200
+
+    response = client.get(f'/tests/{test_id}/item-analysis', headers=admin_headers)
+    assert response.status_code == 200, response.get_json()
+    analysis = response.get_json()
+    assert analysis['submission_count'] == 5
+    assert analysis['mean_score'] == 2
+    assert analysis['score_std'] == pytest.approx(1.41)
+    assert analysis['kr20'] == pytest.approx(0.8)
+
+    questions = analysis['questions']
+    assert [question['question_id'] for question in questions] == question_ids
+    assert [question['p_value'] for question in questions] == pytest.approx(P_VALUES)
+    assert [question['discrimination'] for question in questions] == pytest.approx(DISCRIMINATION)
+    assert questions[1]['options'] == {'A': 0, 'B': 3, 'C': 1, 'D': 0}
+    assert questions[1]['unanswered'] == 1
+    # More candidates chose A than the key on questions 3 and 4
+    assert [question['flags'] for question in questions] == [[], [], ['distractor_preferred'], ['distractor_preferred']]
+
+
+def test_item_analysis_sums_are_exact_across_blocks(app, monkeypatch, new_paper):
+    # Candidate blocks smaller than the matrix give the same statistics as one block
+    test_id, _ = new_paper('ABCD')
+    with app.app_context():
+        key = db_app.get_answer_key(db_app.db.session.get(db_app.Test, test_id))
+    rows = [[db_app.OPTION_CODES.get(answer, 0) for answer in answers] for answers in ANSWERS]
+    matrix = np.array(rows * 7, dtype=np.uint8)
+    whole = db_app.compute_item_analysis(matrix, key)
+    monkeypatch.setattr(db_app, 'ITEM_ANALYSIS_CHUNK_ROWS', 3)
+    assert db_app.compute_item_analysis(matrix, key) == whole
+    assert [question['discrimination'] for question in whole['questions']] == pytest.approx(DISCRIMINATION)
@@ -0,0 +1,16 @@
+"""Background job workers report through the app logger"""
+import logging
+
+import db_app
+
+
+def test_worker_logs_jobs_instead_of_printing(app, caplog, capsys):
+    with app.app_context():
+        job_id = db_app.enqueue_job('no-such-kind', {}).id
+        with caplog.at_level(logging.INFO, logger=app.logger.name):
+            assert db_app.run_job_worker('test-worker', max_jobs=1) == 1
+
+    messages = [(record.levelname, record.getMessage()) for record in caplog.records]
+    assert ('INFO', f'[test-worker] running job {job_id} (no-such-kind), attempt 1') in messages
+    assert ('ERROR', f'[test-worker] job {job_id} failed: Unknown job type: no-such-kind') in messages
+    assert capsys.readouterr().out == ''
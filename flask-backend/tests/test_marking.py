@@ -0,0 +1,90 @@
+"""Per-question and per-section marks, negative marking and section weights"""
+import pytest
+
+import db_app
+
+POLICY = {'pass_percentage': 40, 'negative_marks': 1, 'section_weights': {'Section A': 2}}
+
+# (section, correct option, question marks, question negative marks)
+# Section A has no marks of its own, so the policy applies: 2 per correct answer, 1 off per wrong one.
+# Section B gives 3 marks and takes 2 off; its second question overrides that with 5 marks.
+QUESTIONS = [('Section A', 'A', None, None), ('Section A', 'B', None, 0),
+             ('Section B', 'C', None, None), ('Section B', 'D', 5, None)]
+
+
+@pytest.fixture
+def marked_paper(app, client, admin_headers):
+    """(test id, question ids) of a two-section test marked as in QUESTIONS, graded under POLICY"""
+    with app.app_context():
+        test = db_app.Test(name='Marked test', description='', duration_minutes=60, is_active=True)
+        db_app.db.session.add(test)
+        db_app.db.session.flush()
+        sections = {
+            'Section A': db_app.Section(name='Section A', test_id=test.id, order=1),
+            'Section B': db_app.Section(name='Section B', test_id=test.id, order=2, marks=3, negative_marks=2)
+        }
+        db_app.db.session.add_all(sections.values())
+        db_app.db.session.flush()
+        questions = [
+            db_app.Question(section_id=sections[section].id, section_order=number, question_text=f'Question {number}',
+                            option_a='One', option_b='Two', option_c='Three', option_d='Four',
+                            correct_answer=correct, marks=marks, negative_marks=penalty)
+            for number, (section, correct, marks, penalty) in enumerate(QUESTIONS, start=1)
+        ]
+        db_app.db.session.add_all(questions)
+        db_app.db.session.commit()
+        test_id, question_ids = test.id, [question.id for question in questions]
+
+    response = client.put(f'/tests/{test_id}', json={'grading_policy': POLICY}, headers=admin_headers)
+    assert response.status_code == 200, response.get_json()
+    return test_id, question_ids
+
+
+def test_key_resolves_marks(app, marked_paper):
+    test_id, _ = marked_paper
+    with app.app_context():
+        key = db_app.get_answer_key(db_app.db.session.get(db_app.Test, test_id))
+    assert list(key.marks) == [2, 2, 3, 5]
+    assert list(key.penalties) == [1, 0, 2, 2]
+    assert (list(key.section_marks), key.total_marks) == ([4, 8], 12)
+
+
+def test_marked_submission(client, user_headers, admin_headers, marked_paper, serverless):
+    test_id, question_ids = marked_paper
+    # Right (+2), wrong without penalty (0), wrong (-2), right (+5)
+    body = {'test_id': test_id, 'answers': dict(zip(map(str, question_ids), 'ACAD'))}
+
+    for result in (client.post('/submit', json=body, headers=user_headers).get_json(), serverless(user_headers, body)[1]):
+        overall = result['overall_summary']
+        assert (overall['score_points'], overall['score_total'], overall['score_percentage']) == (5, 12, 41.67)
+        assert overall['pass_status'] == 'Pass'
+        assert [section['score_percentage'] for section in result['section_analysis']] == [50.0, 37.5]
+
+    # The vectorized regrade scores the stored answers the same way
+    response = client.post(f'/tests/{test_id}/regrade', headers=admin_headers)
+    assert response.status_code == 200
+    submissions = client.get(f'/scores?test_id={test_id}', headers=admin_headers).get_json()['submissions']
+    assert [(submission['score']['points'], submission['score']['percentage']) for submission in submissions] == [
+        (5, 41.67), (5, 41.67)
+    ]
+
+
+def test_all_wrong_goes_below_zero(client, user_headers, marked_paper):
+    test_id, question_ids = marked_paper
+    body = {'test_id': test_id, 'answers': dict(zip(map(str, question_ids), 'DDDA'))}
+    overall = client.post('/submit', json=body, headers=user_headers).get_json()['overall_summary']
+    assert (overall['score_points'], overall['pass_status']) == (-1 - 0 - 2 - 2, 'Fail')
+
+
+@pytest.mark.parametrize('policy, error', [
+    ({'negative_marks': -1}, 'negative_marks must be a whole number of marks, 0 or more'),
+    ({'negative_marks': 0.5}, 'negative_marks must be a whole number of marks, 0 or more'),
+    ({'section_weights': {'Section A': 0}}, 'section_weights must map section names to whole marks of 1 or more'),
+    ({'pass_percentage': 101}, 'pass_percentage must be a number from 0 to 100'),
+    ({'bonus': 1}, 'Unknown grading_policy fields: bonus')
+])
+def test_malformed_policy_is_rejected(client, admin_headers, new_paper, policy, error):
+    test_id, _ = new_paper('A')
+    response = client.put(f'/tests/{test_id}', json={'grading_policy': policy}, headers=admin_headers)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == error
@@ -0,0 +1,91 @@
+"""/metrics: per-view request counts and histograms, cache counts, other processes' totals, sampled log lines"""
+import json
+import logging
+import re
+
+import db_app
+
+SAMPLE = re.compile(r'^(\w+)(\{[^}]*\})? (\S+)$')
+
+
+def scrape(client, headers=None):
+    """{'name{labels}': value} from GET /metrics"""
+    response = client.get('/metrics', headers=headers or {})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert response.content_type == 'text/plain; version=0.0.4; charset=utf-8'
+    samples = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if line.startswith('#'):
+            continue
+        name, labels, value = SAMPLE.match(line).groups()
+        samples[name + (labels or '')] = float(value)
+    return samples
+
+
+def delta(before, after, sample):
+    return after.get(sample, 0) - before.get(sample, 0)
+
+
+def test_requests_are_counted_per_view(client, user_headers, new_paper):
+    test_id, _ = new_paper('AB')
+    before = scrape(client)
+    for _ in range(3):
+        assert client.get(f'/questions?test_id={test_id}', headers=user_headers).status_code == 200
+    assert client.get('/questions', headers=user_headers).status_code == 400
+    after = scrape(client)
+
+    assert delta(before, after, 'rompit_http_requests_total{view="get_questions",method="GET",status="200"}') == 3
+    assert delta(before, after, 'rompit_http_requests_total{view="get_questions",method="GET",status="400"}') == 1
+    assert delta(before, after, 'rompit_http_request_duration_seconds_count{view="get_questions"}') == 4
+    assert delta(before, after, 'rompit_http_request_duration_seconds_bucket{view="get_questions",le="+Inf"}') == 4
+    assert delta(before, after, 'rompit_http_request_sql_statements_sum{view="get_questions"}') > 0
+    assert delta(before, after, 'rompit_http_response_size_bytes_count{view="get_questions"}') == 4
+    # One compile, then cache hits
+    assert delta(before, after, 'rompit_cache_requests_total{cache="paper",result="miss"}') == 1
+    assert delta(before, after, 'rompit_cache_requests_total{cache="paper",result="hit"}') == 2
+    assert 'rompit_submission_journal_rows{state="pending"}' in after
+
+
+def test_histogram_buckets_are_cumulative(client):
+    samples = scrape(client)
+    buckets = [value for sample, value in samples.items()
+               if sample.startswith('rompit_http_request_sql_statements_bucket{view="get_metrics",')]
+    assert buckets == sorted(buckets)
+    assert buckets[-1] == samples['rompit_http_request_sql_statements_count{view="get_metrics"}']
+
+
+def test_other_processes_are_added(client):
+    snapshot = {'requests': {'get_tests GET 200': 5}, 'histograms': {}, 'caches': {'paper': [7, 1]}}
+    before = scrape(client)
+    db_app.metrics_store.write('test-other-process', snapshot)
+    try:
+        after = scrape(client)
+    finally:
+        db_app.metrics_store._connect().execute("DELETE FROM snapshot WHERE process = 'test-other-process'")
+    assert delta(before, after, 'rompit_http_requests_total{view="get_tests",method="GET",status="200"}') == 5
+    assert delta(before, after, 'rompit_cache_requests_total{cache="paper",result="hit"}') == 7
+    assert delta(before, after, 'rompit_metrics_processes') == 1
+
+
+def test_metrics_token(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 'scrape-secret')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    scrape(client, {'Authorization': 'Bearer scrape-secret'})
+
+
+def test_sampled_request_log_line(app, client, monkeypatch):
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    db_app.request_log.addHandler(handler)
+    monkeypatch.setitem(app.config, 'METRICS_LOG_SAMPLE_RATE', 1.0)
+    try:
+        client.get('/tests')
+    finally:
+        db_app.request_log.removeHandler(handler)
+
+    line = json.loads(records[-1].getMessage())
+    assert (line['event'], line['method'], line['path'], line['view'], line['status']) == ('request', 'GET', '/tests', 'get_tests', 401)
+    assert line['sampled'] is True
+    assert set(line) >= {'duration_ms', 'sql_statements', 'sql_ms', 'request_bytes', 'response_bytes'}
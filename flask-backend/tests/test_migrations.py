@@ -0,0 +1,53 @@
+"""Schema migrations on a fresh database: every hot-path index is built, and re-running changes nothing"""
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+import db_app
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine('sqlite:///' + str(tmp_path / 'fresh.db'))
+    yield engine
+    engine.dispose()
+
+
+def schema(engine):
+    """{table: (column names, index names)}"""
+    inspector = inspect(engine)
+    return {
+        table: ({column['name'] for column in inspector.get_columns(table)},
+                {index['name'] for index in inspector.get_indexes(table)})
+        for table in inspector.get_table_names()
+    }
+
+
+def test_fresh_database_gets_every_migration_and_index(engine):
+    db_app.db.metadata.create_all(engine)
+    # As on a database created before migration 2
+    with engine.begin() as connection:
+        for _, name in db_app.HOT_PATH_INDEXES:
+            connection.execute(text(f'DROP INDEX IF EXISTS {name}'))
+
+    assert db_app.migrate(engine) == [version for version, *_ in db_app.MIGRATIONS]
+    indexes = schema(engine)
+    for table, name in db_app.HOT_PATH_INDEXES:
+        assert name in indexes[table][1], f'{name} missing on {table}'
+    assert db_app.applied_migrations(engine) == {version for version, *_ in db_app.MIGRATIONS}
+
+
+def test_migrations_are_idempotent(engine):
+    db_app.db.metadata.create_all(engine)
+    db_app.migrate(engine)
+    migrated = schema(engine)
+
+    assert db_app.migrate(engine) == []
+    # Each migration run again by hand, as after a crash between running it and recording it
+    for version, name, function, transactional in db_app.MIGRATIONS:
+        if transactional:
+            with engine.begin() as connection:
+                function(connection)
+        else:
+            with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                function(connection)
+    assert schema(engine) == migrated
@@ -0,0 +1,99 @@
+"""Packed Submission.answers: the pack/unpack round trip, older layouts, and converting JSON rows"""
+import json
+import random
+from array import array
+from datetime import datetime
+
+import pytest
+
+import db_app
+from api._answers import AnswerLayout, pack_answers, packed_size, unpack_answers, unpack_code_matrix, unpack_letters
+from conftest import flush_journal
+
+
+@pytest.mark.parametrize('question_count', [1, 2, 3, 4, 7, 200])
+def test_pack_round_trip(question_count):
+    layout = AnswerLayout(1, 1, array('i', range(100, 100 + question_count)))
+    generator = random.Random(question_count)
+    for _ in range(20):
+        answers = {question_key: generator.choice('ABCD') for question_key in layout.question_keys
+                   if generator.random() < 0.7}
+        codes = pack_answers(layout, answers)
+        assert len(codes) == packed_size(question_count)
+        assert unpack_answers(layout, codes) == answers
+        letters = unpack_letters(codes, question_count)
+        assert letters == ''.join(answers.get(question_key, ' ') for question_key in layout.question_keys)
+        assert unpack_code_matrix([codes], question_count)[0].tolist() == [' ABCD'.index(letter) for letter in letters]
+
+
+@pytest.mark.parametrize('answers', [{'999': 'A'}, {'100': 'E'}, {'100': 'a'}, {'100': 1}, ['A']])
+def test_answers_a_layout_cannot_hold_stay_unpacked(answers):
+    layout = AnswerLayout(1, 1, array('i', [100, 101]))
+    assert pack_answers(layout, answers) is None
+
+
+def store_json_submission(app, test_id, answers):
+    """Store a submission the way rows were stored before packing; returns its id"""
+    with app.app_context():
+        user = db_app.User.query.filter_by(user_id='test123').one()
+        submission = db_app.Submission(
+            id=db_app.submission_ids.next_id(), user_id=user.id, test_id=test_id, answers=json.dumps(answers),
+            score_points=0, score_total=len(answers), score_percentage=0.0, submitted_at=datetime.utcnow()
+        )
+        db_app.db.session.add(submission)
+        db_app.db.session.commit()
+        return submission.id
+
+
+def test_older_layouts_map_onto_the_current_key(app, client, user_headers, new_paper):
+    test_id, question_ids = new_paper('ABC')
+    body = {'test_id': test_id, 'answers': {str(question_ids[0]): 'A', str(question_ids[2]): 'D'}}
+    packed_id = client.post('/submit', json=body, headers=user_headers).get_json()['submission_id']
+    flush_journal(app)
+
+    # The paper changes: the second question is dropped and a new one is put first
+    with app.app_context():
+        db_app.Question.query.filter_by(id=question_ids[1]).delete()
+        added = db_app.Question(section_id=db_app.db.session.get(db_app.Question, question_ids[0]).section_id,
+                                section_order=0, question_text='New', option_a='1', option_b='2', option_c='3',
+                                option_d='4', correct_answer='B')
+        db_app.db.session.add(added)
+        db_app.bump_paper_version(db_app.db.session.get(db_app.Test, test_id))
+        db_app.db.session.commit()
+        added_id = added.id
+    json_id = store_json_submission(app, test_id, {str(added_id): 'B', str(question_ids[2]): 'C'})
+
+    with app.app_context():
+        test = db_app.db.session.get(db_app.Test, test_id)
+        key = db_app.get_answer_key(test)
+        assert key.question_keys == (str(added_id), str(question_ids[0]), str(question_ids[2]))
+        matrix = db_app.load_answer_matrix(test, key)
+        stored = {row.id: (row.answer_dict, row.answer_codes is not None)
+                  for row in db_app.Submission.query.filter_by(test_id=test_id)}
+    # Packed under the old layout: A and D land in the columns of their questions; the new question is blank
+    assert sorted(matrix.tolist()) == [[0, 1, 4], [2, 0, 3]]
+    # The packed row still decodes to the question ids that were answered
+    assert stored == {
+        packed_id: ({str(question_ids[0]): 'A', str(question_ids[2]): 'D'}, True),
+        json_id: ({str(added_id): 'B', str(question_ids[2]): 'C'}, False)
+    }
+
+
+def test_pack_answers_command_keeps_to_dict(app, new_paper):
+    test_id, question_ids = new_paper('AB')
+    packable = store_json_submission(app, test_id, {str(question_ids[0]): 'B'})
+    unpackable = store_json_submission(app, test_id, {'999999': 'A'})
+    with app.app_context():
+        before = {submission_id: db_app.db.session.get(db_app.Submission, submission_id).to_dict()
+                  for submission_id in (packable, unpackable)}
+
+    result = app.test_cli_runner().invoke(args=['pack-answers'])
+    assert result.exit_code == 0, result.output
+    assert f'Test {test_id}: packed 1 submissions, kept 1 as JSON' in result.output
+
+    with app.app_context():
+        packed = db_app.db.session.get(db_app.Submission, packable)
+        assert (packed.answers, packed.answer_codes is not None) == ('', True)
+        assert db_app.db.session.get(db_app.Submission, unpackable).answer_codes is None
+        assert {submission_id: db_app.db.session.get(db_app.Submission, submission_id).to_dict()
+                for submission_id in (packable, unpackable)} == before
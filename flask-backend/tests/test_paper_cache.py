@@ -0,0 +1,75 @@
+"""GET /questions serves a cached, answer-free paper with an ETag, recompiled when the paper changes"""
+import os
+
+from openpyxl import Workbook
+
+import db_app
+from api._paper import paper_cache
+
+SAMPLE_USERS = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, 'sample-data', 'users_sample.xlsx')
+
+
+def get_paper(client, headers, test_id, etag=None):
+    if etag:
+        headers = dict(headers, **{'If-None-Match': etag})
+    return client.get(f'/questions?test_id={test_id}', headers=headers)
+
+
+def test_paper_is_answer_free_and_revalidates(client, user_headers, new_paper):
+    test_id, question_ids = new_paper('ABC')
+    first = get_paper(client, user_headers, test_id)
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    paper = first.get_json()
+    assert [question['id'] for question in paper['sections'][0]['questions']] == question_ids
+    assert b'correct_answer' not in first.data
+
+    hits = paper_cache.hits
+    again = get_paper(client, user_headers, test_id, etag=first.headers['ETag'])
+    assert again.status_code == 304
+    assert again.data == b''
+    assert paper_cache.hits == hits + 1
+
+
+def test_paper_recompiled_after_upload_and_update(client, user_headers, admin_headers, new_paper, tmp_path):
+    test_id, _ = new_paper('AB')
+    before = get_paper(client, user_headers, test_id)
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = 'Replaced'
+    sheet.append(['question', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_answer'])
+    sheet.append(['New question', 'w', 'x', 'y', 'z', 'D'])
+    workbook.save(tmp_path / 'exam.xlsx')
+    with open(SAMPLE_USERS, 'rb') as user_file, open(tmp_path / 'exam.xlsx', 'rb') as exam_file:
+        response = client.post('/upload', headers=admin_headers, content_type='multipart/form-data', data={
+            'test_id': str(test_id), 'user_file': (user_file, 'users.xlsx'), 'exam_file': (exam_file, 'exam.xlsx')
+        })
+    assert response.status_code == 200, response.get_json()
+
+    replaced = get_paper(client, user_headers, test_id, etag=before.headers['ETag'])
+    assert replaced.status_code == 200
+    assert int(replaced.headers['X-Paper-Version']) > int(before.headers['X-Paper-Version'])
+    sections = replaced.get_json()['sections']
+    assert [section['name'] for section in sections] == ['Replaced']
+    assert sections[0]['questions'][0]['options'] == {'A': 'w', 'B': 'x', 'C': 'y', 'D': 'z'}
+
+    assert client.put(f'/tests/{test_id}', json={'name': 'Renamed'}, headers=admin_headers).status_code == 200
+    renamed = get_paper(client, user_headers, test_id, etag=replaced.headers['ETag'])
+    assert renamed.status_code == 200
+    assert renamed.get_json()['test']['name'] == 'Renamed'
+
+
+def test_version_bump_from_another_worker_recompiles(app, client, user_headers, new_paper):
+    # Another worker changed the paper: the version moved on but this process's cache was never told
+    test_id, _ = new_paper('AB')
+    before = get_paper(client, user_headers, test_id)
+    with app.app_context():
+        test = db_app.db.session.get(db_app.Test, test_id)
+        test.description = 'Changed elsewhere'
+        db_app.bump_paper_version(test)
+        db_app.db.session.commit()
+
+    after = get_paper(client, user_headers, test_id, etag=before.headers['ETag'])
+    assert after.status_code == 200
+    assert after.get_json()['test']['description'] == 'Changed elsewhere'
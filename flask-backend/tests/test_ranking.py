@@ -0,0 +1,25 @@
+"""Rankings returned by /submit count each stored submission once"""
+import db_app
+from conftest import flush_journal
+
+
+def test_retried_submit_is_not_ranked_twice(app, client, user_headers, new_paper):
+    test_id, question_ids = new_paper('AB')
+    body = {'test_id': test_id, 'answers': {str(question_ids[0]): 'A'}}
+    headers = dict(user_headers, **{'Idempotency-Key': 'ranking-retry'})
+    first = client.post('/submit', json=body, headers=headers).get_json()
+    assert first['ranking']['out_of'] == 1
+
+    # Stored, and the ranking refreshed from test_stats, as another worker would see it
+    flush_journal(app)
+    with app.app_context():
+        db_app.invalidate_test_caches(test_id)
+    retry = client.post('/submit', json=body, headers=headers).get_json()
+    assert retry['submission_id'] == first['submission_id']
+    assert retry['ranking'] == first['ranking']
+
+    # Also while the first is still journaled
+    headers['Idempotency-Key'] = 'ranking-journaled'
+    second = client.post('/submit', json=body, headers=headers).get_json()
+    again = client.post('/submit', json=body, headers=headers).get_json()
+    assert second['ranking']['out_of'] == again['ranking']['out_of'] == 2
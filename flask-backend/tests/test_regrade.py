@@ -0,0 +1,75 @@
+"""POST /tests/<id>/regrade re-scores stored submissions against a corrected key"""
+import pytest
+
+# Per question of an 'ABCD' paper; ' ' is unanswered
+ANSWER_SETS = ('ABCD', 'ABCC', 'AB  ', 'DCBA')
+
+
+def scores(client, headers, test_id):
+    submissions = client.get(f'/scores?test_id={test_id}', headers=headers).get_json()['submissions']
+    return {submission['id']: (submission['score']['points'], submission['score']['percentage']) for submission in submissions}
+
+
+def submit_all(client, headers, test_id, question_ids):
+    ids = []
+    for answers in ANSWER_SETS:
+        body = {'test_id': test_id, 'answers': {str(question_id): answer
+                                                for question_id, answer in zip(question_ids, answers) if answer != ' '}}
+        ids.append(client.post('/submit', json=body, headers=headers).get_json()['submission_id'])
+    return ids
+
+
+def test_regrade_applies_corrections(client, user_headers, admin_headers, new_paper):
+    test_id, question_ids = new_paper('ABCD')
+    submission_ids = submit_all(client, user_headers, test_id, question_ids)
+    assert [scores(client, admin_headers, test_id)[submission_id][0] for submission_id in submission_ids] == [4, 3, 2, 0]
+
+    # Question 4's key was wrong: C, not D
+    response = client.post(f'/tests/{test_id}/regrade', json={'corrections': {str(question_ids[3]): 'C'}},
+                           headers=admin_headers)
+    assert response.status_code == 200, response.get_json()
+    result = response.get_json()
+    assert (result['regraded'], result['corrected_questions'], result['score_total']) == (4, 1, 4)
+    assert result['average_percentage'] == pytest.approx((75 + 100 + 50 + 0) / 4)
+    assert result['section_summary'] == [{
+        'section_name': 'Section A', 'total_questions': 4, 'average_correct': 2.25,
+        'score_percentage': 56.25, 'accuracy': 64.29
+    }]
+
+    regraded = scores(client, admin_headers, test_id)
+    assert [regraded[submission_id] for submission_id in submission_ids] == [(3, 75.0), (4, 100.0), (2, 50.0), (0, 0.0)]
+    # New submissions are graded against the corrected key too
+    fresh = submit_all(client, user_headers, test_id, question_ids)
+    fresh_scores = scores(client, admin_headers, test_id)
+    assert [fresh_scores[submission_id] for submission_id in fresh] == [regraded[submission_id] for submission_id in submission_ids]
+
+
+def test_regrade_without_corrections_keeps_scores(client, user_headers, admin_headers, new_paper):
+    test_id, question_ids = new_paper('ABCD')
+    submit_all(client, user_headers, test_id, question_ids)
+    before = scores(client, admin_headers, test_id)
+    response = client.post(f'/tests/{test_id}/regrade', headers=admin_headers)
+    assert response.status_code == 200
+    assert response.get_json()['corrected_questions'] == 0
+    assert scores(client, admin_headers, test_id) == before
+
+
+@pytest.mark.parametrize('corrections, error', [
+    ({'1': 'E'}, 'Corrected answers must be one of A, B, C or D'),
+    (['A'], 'corrections must be an object of question id to option'),
+    ({'first': 'A'}, 'corrections must be keyed by question id')
+])
+def test_regrade_rejects_malformed_corrections(client, admin_headers, new_paper, corrections, error):
+    test_id, _ = new_paper('AB')
+    response = client.post(f'/tests/{test_id}/regrade', json={'corrections': corrections}, headers=admin_headers)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == error
+
+
+def test_regrade_rejects_questions_of_another_test(client, admin_headers, new_paper):
+    test_id, _ = new_paper('AB')
+    _, other_question_ids = new_paper('AB', name='Other test')
+    response = client.post(f'/tests/{test_id}/regrade', json={'corrections': {str(other_question_ids[0]): 'B'}},
+                           headers=admin_headers)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Some corrected questions do not belong to this test'
@@ -0,0 +1,73 @@
+"""/download-scores streams a test's scores as CSV, or as Parquet and Arrow when pyarrow is installed"""
+import csv
+import io
+
+import pytest
+
+import db_app
+from conftest import flush_journal
+
+
+def submit(client, headers, test_id, question_ids, answers):
+    body = {'test_id': test_id, 'answers': {str(question_id): answer for question_id, answer in zip(question_ids, answers)}}
+    return client.post('/submit', json=body, headers=headers).get_json()['submission_id']
+
+
+@pytest.fixture
+def scored_test(client, user_headers, new_paper):
+    """(test id, submission ids) of a fresh test with three submissions"""
+    test_id, question_ids = new_paper('AB')
+    return test_id, [submit(client, user_headers, test_id, question_ids, answers) for answers in ('AB', 'AA', 'CC')]
+
+
+def test_csv_is_streamed_for_one_test(client, admin_headers, scored_test):
+    test_id, submission_ids = scored_test
+    response = client.get(f'/download-scores?test_id={test_id}', headers=admin_headers)
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.headers['Content-Disposition'] == 'attachment; filename=exam_scores.csv'
+
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == db_app.SCORES_CSV_HEADER
+    assert [(int(row[0]), row[1], row[2], row[3], row[4]) for row in rows[1:]] == [
+        (submission_ids[0], 'test123', '2', '2', '100.0'),
+        (submission_ids[1], 'test123', '1', '2', '50.0'),
+        (submission_ids[2], 'test123', '0', '2', '0.0')
+    ]
+
+
+def test_csv_chunks(app, monkeypatch, scored_test):
+    test_id, _ = scored_test
+    monkeypatch.setattr(db_app, 'EXPORT_CHUNK_SIZE', 2)
+    flush_journal(app)
+    with app.app_context():
+        chunks = list(db_app.iter_scores_csv(test_id))
+    # Header and two rows, then the last row
+    assert [chunk.count('\n') for chunk in chunks] == [3, 1]
+
+
+def test_export_errors(client, admin_headers, new_paper):
+    test_id, _ = new_paper('AB')
+    response = client.get(f'/download-scores?test_id={test_id}', headers=admin_headers)
+    assert response.status_code == 404
+    assert response.get_json()['error'] == 'No submissions available'
+    response = client.get('/download-scores?format=xlsx', headers=admin_headers)
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('export_format', ['parquet', 'arrow'])
+def test_columnar_exports(client, admin_headers, scored_test, export_format):
+    pyarrow = pytest.importorskip('pyarrow')
+    test_id, submission_ids = scored_test
+    response = client.get(f'/download-scores?test_id={test_id}&format={export_format}', headers=admin_headers)
+    assert response.status_code == 200
+    assert response.mimetype == db_app.EXPORT_FORMATS[export_format][0]
+
+    if export_format == 'parquet':
+        import pyarrow.parquet
+        table = pyarrow.parquet.read_table(io.BytesIO(response.data))
+    else:
+        table = pyarrow.ipc.open_stream(response.data).read_all()
+    assert table.column_names == db_app.SCORE_EXPORT_COLUMNS
+    assert table.column('id').to_pylist() == submission_ids
+    assert table.column('score_points').to_pylist() == [2, 1, 0]
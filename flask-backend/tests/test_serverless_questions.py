@@ -0,0 +1,54 @@
+"""api/questions.py serves the same cached paper as GET /questions, loaded with one query"""
+import pytest
+from sqlalchemy import event
+
+import api._db
+import api.questions
+from api._paper import paper_cache
+
+
+@pytest.fixture
+def questions(app, serverless, monkeypatch):
+    """questions(headers, query) calls api/questions.py's handler on the app's database; returns its response dict"""
+    monkeypatch.setattr(api.questions, 'JWT_SECRET', app.config['JWT_SECRET_KEY'])
+
+    def call(headers, query):
+        return api.questions.handler({'headers': headers, 'query': query})
+    return call
+
+
+def test_serverless_paper_matches_flask(client, user_headers, new_paper, questions):
+    test_id, _ = new_paper('ABC')
+    flask_response = client.get(f'/questions?test_id={test_id}', headers=user_headers)
+
+    # Compiled afresh by the handler, with a single ordered query for the whole paper
+    paper_cache.invalidate(test_id)
+    statements = []
+    engine = api._db.get_engine()
+
+    def record(conn, cursor, statement, *rest):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = questions(user_headers, {'test_id': str(test_id)})
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    assert response['statusCode'] == 200
+    assert response['body'].encode('utf-8') == flask_response.data
+    assert response['headers']['ETag'] == flask_response.headers['ETag']
+    assert response['headers']['X-Paper-Version'] == flask_response.headers['X-Paper-Version']
+    assert len(statements) == 3  # user, test, paper
+    assert sum('FROM section' in statement for statement in statements) == 1
+
+    revalidated = questions(dict(user_headers, **{'If-None-Match': response['headers']['ETag']}), {'testId': str(test_id)})
+    assert (revalidated['statusCode'], revalidated['body']) == (304, '')
+
+
+def test_serverless_paper_errors(new_paper, user_headers, questions):
+    test_id, _ = new_paper('A')
+    assert questions({}, {'test_id': str(test_id)})['statusCode'] == 401
+    assert questions({'Authorization': 'Bearer not-a-token'}, {'test_id': str(test_id)})['statusCode'] == 401
+    assert questions(user_headers, {})['statusCode'] == 400
+    assert questions(user_headers, {'test_id': '999999'})['statusCode'] == 404
@@ -0,0 +1,59 @@
+"""App startup in a fresh process: no heavy imports, a bounded import time and a re-runnable init-db"""
+import os
+import sqlite3
+import subprocess
+import sys
+
+from benchmarks.startup import import_times
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_TABLES = ('user', 'test', 'section', 'question', 'schema_migration')
+# Twice the benchmarks/startup.py budget, so slow or busy test machines don't fail it; the
+# benchmark holds the real 1500 ms budget
+IMPORT_BUDGET_MS = 3000
+
+
+def run(tmp_path, *args):
+    """Run python with args in a scratch directory against a scratch SQLite database"""
+    env = dict(
+        os.environ,
+        PYTHONPATH=BACKEND,
+        FLASK_SQLALCHEMY_DATABASE_URI='sqlite:///' + str(tmp_path / 'exam.db')
+    )
+    result = subprocess.run([sys.executable, *args], cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def test_create_app_does_not_import_pandas_or_numpy(tmp_path):
+    output = run(tmp_path, '-c', (
+        'import sys, db_app\n'
+        'db_app.create_app()\n'
+        "print(sorted(name for name in ('pandas', 'numpy') if name in sys.modules))"
+    ))
+    assert output.strip().splitlines()[-1] == '[]'
+
+
+def test_db_app_imports_within_budget(tmp_path):
+    env = dict(os.environ,
+               FLASK_SQLALCHEMY_DATABASE_URI='sqlite:///' + str(tmp_path / 'exam.db'),
+               FLASK_SUBMIT_JOURNAL_PATH=str(tmp_path / 'journal' / 'submissions.db'))
+    # Best of three fresh interpreters, after one that warms the bytecode cache
+    runs = [import_times('import db_app', env) for _ in range(4)][1:]
+    best_ms = min(next(cumulative for _, name, _, cumulative in rows if name == 'db_app') for rows in runs) / 1000
+    assert best_ms < IMPORT_BUDGET_MS
+    assert not (tmp_path / 'exam.db').exists()
+
+
+def test_init_db_twice_is_a_no_op(tmp_path):
+    first = run(tmp_path, '-m', 'flask', '--app', 'db_app', 'init-db')
+    assert 'Applying migration' in first and 'Database initialized' in first
+
+    def counts():
+        with sqlite3.connect(tmp_path / 'exam.db') as connection:
+            return {table: connection.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] for table in SAMPLE_TABLES}
+    before = counts()
+
+    second = run(tmp_path, '-m', 'flask', '--app', 'db_app', 'init-db')
+    assert second.strip() == 'Database initialized'
+    assert counts() == before
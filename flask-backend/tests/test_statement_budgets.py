@@ -0,0 +1,119 @@
+"""SQL statements per request, checked against per-endpoint budgets
+
+Warm: the process caches (paper, answer key, ranking, item analysis) are
+filled, the write-behind journal is empty and stored reports are current, as
+for almost every request a worker serves. Cold: the first request after the
+caches were dropped (a new worker, or a paper edit seen from another one),
+with one of the caller's submissions still journaled, so the views that drain
+the journal or build a report pay for that too.
+"""
+import pytest
+
+import db_app
+from conftest import counting_statements, flush_journal
+
+# view -> (method, path, caller)
+REQUESTS = {
+    'get_tests': ('GET', '/tests', 'admin'),
+    'get_active_tests': ('GET', '/active-tests', 'user'),
+    'get_test': ('GET', '/tests/{test_id}', 'admin'),
+    'get_questions': ('GET', '/questions?test_id={test_id}', 'user'),
+    'submit_exam': ('POST', '/submit', 'user'),
+    'save_attempt_answers': ('PATCH', '/attempts/{attempt_id}/answers', 'user'),
+    'get_my_submissions': ('GET', '/my-submissions', 'user'),
+    'get_submission_details': ('GET', '/submission/{submission_id}', 'user'),
+    'get_scores': ('GET', '/scores', 'admin'),
+    'get_test_analysis': ('GET', '/test-analysis/{test_id}', 'admin'),
+    'get_item_analysis': ('GET', '/tests/{test_id}/item-analysis', 'admin'),
+    'get_leaderboard': ('GET', '/tests/{test_id}/leaderboard', 'admin')
+}
+
+# view -> (warm budget, cold budget)
+STATEMENT_BUDGETS = {
+    'get_tests': (1, 2),
+    'get_active_tests': (1, 1),
+    'get_test': (3, 3),
+    'get_questions': (1, 2),
+    'submit_exam': (1, 3),
+    'save_attempt_answers': (1, 2),
+    'get_my_submissions': (1, 13),
+    'get_submission_details': (3, 16),
+    'get_scores': (1, 13),
+    'get_test_analysis': (3, 16),
+    'get_item_analysis': (3, 16),
+    'get_leaderboard': (2, 16)
+}
+# Viewing a report the last regrade made stale rebuilds it
+REGRADED_REPORT_BUDGET = 9
+
+
+def submit(client, headers, test_id, question_ids):
+    response = client.post('/submit', json={
+        'test_id': test_id,
+        'answers': {str(question_id): 'A' for question_id in question_ids}
+    }, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['submission_id']
+
+
+def statements(client, view, headers, question_ids, **params):
+    """Run one request to a view and return how many SQL statements it ran"""
+    method, path, _ = REQUESTS[view]
+    body = None
+    if view == 'submit_exam':
+        body = {'test_id': params['test_id'], 'answers': {str(question_id): 'B' for question_id in question_ids}}
+    elif view == 'save_attempt_answers':
+        body = {'answers': {str(question_ids[0]): 'C'}}
+    with counting_statements() as counts:
+        response = client.open(path.format(**params), method=method, json=body, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return counts[0]
+
+
+@pytest.fixture
+def scenario(app, client, user_headers, admin_headers, paper):
+    """Headers by caller, the sample paper's question ids, and the ids a request path needs"""
+    test_id, question_ids = paper
+    attempt = client.post('/attempts', json={'test_id': test_id}, headers=user_headers).get_json()['attempt']
+    params = {
+        'test_id': test_id,
+        'attempt_id': attempt['id'],
+        'submission_id': submit(client, user_headers, test_id, question_ids)
+    }
+    return {'user': user_headers, 'admin': admin_headers}, question_ids, params
+
+
+@pytest.mark.parametrize('view', sorted(REQUESTS))
+def test_warm_statement_budget(app, client, scenario, view):
+    headers, question_ids, params = scenario
+    caller = headers[REQUESTS[view][2]]
+    statements(client, view, caller, question_ids, **params)
+    flush_journal(app)
+
+    count = statements(client, view, caller, question_ids, **params)
+    assert count <= STATEMENT_BUDGETS[view][0], f'{view} ran {count} SQL statements warm'
+
+
+@pytest.mark.parametrize('view', sorted(REQUESTS))
+def test_cold_statement_budget(app, client, scenario, view):
+    headers, question_ids, params = scenario
+    caller = headers[REQUESTS[view][2]]
+    statements(client, view, caller, question_ids, **params)
+    flush_journal(app)
+    # A journaled submission of the caller's, and a new one to view
+    params['submission_id'] = submit(client, headers['user'], params['test_id'], question_ids)
+    with app.app_context():
+        db_app.invalidate_test_caches(params['test_id'])
+
+    count = statements(client, view, caller, question_ids, **params)
+    assert count <= STATEMENT_BUDGETS[view][1], f'{view} ran {count} SQL statements cold'
+
+
+def test_regraded_report_budget(app, client, scenario):
+    headers, question_ids, params = scenario
+    flush_journal(app)
+    response = client.post(f"/tests/{params['test_id']}/regrade", json={}, headers=headers['admin'])
+    assert response.status_code == 200, response.get_json()
+
+    count = statements(client, 'get_submission_details', headers['user'], question_ids, **params)
+    assert count <= REGRADED_REPORT_BUDGET, f'get_submission_details ran {count} SQL statements after a regrade'
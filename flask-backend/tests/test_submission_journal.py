@@ -0,0 +1,147 @@
+"""Write-behind journal: rows that fail to store are retried or dead-lettered, never dropped"""
+import json
+import threading
+from datetime import datetime
+
+import pytest
+
+import db_app
+
+
+@pytest.fixture
+def journal(app, monkeypatch, tmp_path):
+    """An empty journal of its own, so rows other tests leave behind don't count"""
+    journal = db_app.SubmissionJournal(str(tmp_path / 'submissions.db'))
+    # The app's flusher thread reads the same module global; keep it from claiming rows mid-test
+    claim = journal.claim
+    monkeypatch.setattr(journal, 'claim', lambda *args, **kwargs: (
+        claim(*args, **kwargs) if threading.current_thread() is threading.main_thread() else []
+    ))
+    monkeypatch.setattr(db_app, 'submission_journal', journal)
+    return journal
+
+
+def journal_row(app, journal, paper, **overrides):
+    """Journal a submission row as /submit does. Returns (idempotency key, id)."""
+    test_id, question_ids = paper
+    with app.app_context():
+        user = db_app.User.query.filter_by(user_id='test123').one()
+        values = dict({
+            'id': db_app.submission_ids.next_id(),
+            'user_id': user.id,
+            'test_id': test_id,
+            'answers': json.dumps({str(question_id): 'A' for question_id in question_ids}),
+            'score_points': 1,
+            'score_total': len(question_ids),
+            'score_percentage': 25.0,
+            'idempotency_key': None,
+            'submitted_at': datetime.utcnow()
+        }, **overrides)
+    journal.append(values)
+    return f"submission:{values['id']}", values['id']
+
+
+def flush(app):
+    with app.app_context():
+        return db_app.flush_submissions()
+
+
+def stored(app, submission_id):
+    with app.app_context():
+        return db_app.db.session.get(db_app.Submission, submission_id) is not None
+
+
+def dead_letters(journal):
+    return {key: (attempts, error) for key, attempts, error in journal._connect().execute(
+        'SELECT idempotency_key, attempts, error FROM dead_letter'
+    )}
+
+
+def test_unstorable_row_is_dead_lettered_and_the_rest_stored(app, journal, paper):
+    _, first = journal_row(app, journal, paper)
+    bad_key, bad = journal_row(app, journal, paper, score_points=None)
+    _, last = journal_row(app, journal, paper)
+
+    assert flush(app) == 3
+    assert stored(app, first) and stored(app, last) and not stored(app, bad)
+    assert journal.counts() == (0, 1)
+    attempts, error = dead_letters(journal)[bad_key]
+    assert attempts == 1 and error.startswith('IntegrityError')
+    # A retried submit still gets the id it was given
+    assert journal.lookup(bad_key) == bad
+
+
+def test_failing_row_is_retried_with_backoff_then_dead_lettered(app, journal, paper, monkeypatch):
+    bad_key, bad = journal_row(app, journal, paper, score_percentage='not a number')
+    _, good = journal_row(app, journal, paper)
+
+    assert flush(app) == 2
+    assert stored(app, good) and not stored(app, bad)
+    assert journal.counts() == (1, 0)
+    # Backing off, so it doesn't hold up the rows behind it
+    assert flush(app) == 0
+    _, later = journal_row(app, journal, paper)
+    assert flush(app) == 1 and stored(app, later)
+
+    # As if the backoff had run out each time
+    monkeypatch.setattr(db_app, 'SUBMIT_FLUSH_RETRY_SECONDS', 0)
+    journal.release([bad_key])
+    for _ in range(db_app.SUBMIT_FLUSH_MAX_ATTEMPTS):
+        flush(app)
+    assert journal.counts() == (0, 1)
+    assert dead_letters(journal)[bad_key][0] == db_app.SUBMIT_FLUSH_MAX_ATTEMPTS
+
+
+def test_drain_command_fails_while_rows_are_left(app, journal, paper):
+    runner = app.test_cli_runner()
+    _, good = journal_row(app, journal, paper)
+    result = runner.invoke(args=['drain-submissions', '--timeout', '0'])
+    assert result.exit_code == 0, result.output
+    assert stored(app, good)
+
+    journal_row(app, journal, paper, score_points=None)
+    result = runner.invoke(args=['drain-submissions', '--timeout', '0'])
+    assert result.exit_code == 1
+    assert '0 submissions still journaled, 1 dead-lettered' in result.output
+
+    result = runner.invoke(args=['drain-submissions', '--timeout', '0', '--requeue'])
+    assert 'Requeued 1 dead-lettered submissions' in result.output and result.exit_code == 1
+    assert journal.counts() == (0, 1)
+
+
+def test_metrics_report_journal_rows(app, client, journal, paper):
+    journal_row(app, journal, paper, score_points=None)
+    flush(app)
+    journal_row(app, journal, paper)
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert f'{db_app.METRICS_PREFIX}submission_journal_rows{{state="pending"}} 1' in text
+    assert f'{db_app.METRICS_PREFIX}submission_journal_rows{{state="dead_letter"}} 1' in text
+
+
+def test_row_whose_id_another_writer_took_is_dead_lettered(app, journal, paper):
+    _, submission_id = journal_row(app, journal, paper)
+    assert flush(app) == 1
+    with app.app_context():
+        submitted_at = db_app.db.session.get(db_app.Submission, submission_id).submitted_at
+
+    # A replay of the stored row is dropped; a different submission under the same id is not
+    journal_row(app, journal, paper, id=submission_id, submitted_at=submitted_at)
+    assert flush(app) == 1 and journal.counts() == (0, 0)
+    journal_row(app, journal, paper, id=submission_id, idempotency_key='another-writer')
+    assert flush(app) == 1 and journal.counts() == (0, 1)
+    assert 'another submission' in dead_letters(journal)['another-writer'][1]
+
+
+def test_admin_reads_include_journaled_submissions(app, client, journal, user_headers, admin_headers, new_paper):
+    test_id, question_ids = new_paper('AB')
+    response = client.post('/submit', json={'test_id': test_id, 'answers': {str(question_ids[0]): 'A'}},
+                           headers=user_headers)
+    submission_id = response.get_json()['submission_id']
+    assert journal.has_pending(submission_id=submission_id)
+
+    scores = client.get(f'/scores?test_id={test_id}', headers=admin_headers).get_json()['submissions']
+    assert [row['id'] for row in scores] == [submission_id]
+    leaderboard = client.get(f'/tests/{test_id}/leaderboard', headers=admin_headers).get_json()
+    assert submission_id in [row['submission_id'] for row in leaderboard['leaderboard']]
+    assert journal.counts() == (0, 0)
@@ -0,0 +1,60 @@
+"""GET /submission/<id> serves the report stored with the submission, with an ETag"""
+import db_app
+from conftest import flush_journal
+
+
+def view(client, headers, submission_id, etag=None):
+    if etag:
+        headers = dict(headers, **{'If-None-Match': etag})
+    return client.get(f'/submission/{submission_id}', headers=headers)
+
+
+def stored_report(app, submission_id):
+    with app.app_context():
+        return db_app.db.session.get(db_app.SubmissionReport, submission_id)
+
+
+def test_report_stored_with_submission_and_revalidated(app, client, user_headers, new_paper):
+    test_id, question_ids = new_paper('AB')
+    body = {'test_id': test_id, 'answers': {str(question_ids[0]): 'A'}}
+    submission_id = client.post('/submit', json=body, headers=user_headers).get_json()['submission_id']
+    flush_journal(app)
+    assert stored_report(app, submission_id) is not None
+
+    first = view(client, user_headers, submission_id)
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    assert first.get_json()['overall_summary']['correct'] == 1
+    assert first.get_json()['ranking']['out_of'] == 1
+
+    again = view(client, user_headers, submission_id, etag=first.headers['ETag'])
+    assert again.status_code == 304
+    assert again.headers['ETag'] == first.headers['ETag']
+
+    # Another submission moves the ranking, so the report's ETag changes with it
+    client.post('/submit', json={'test_id': test_id, 'answers': {}}, headers=user_headers)
+    moved = view(client, user_headers, submission_id, etag=first.headers['ETag'])
+    assert moved.status_code == 200
+    assert moved.get_json()['ranking']['out_of'] == 2
+
+
+def test_regrade_rebuilds_reports(app, client, user_headers, admin_headers, new_paper):
+    test_id, question_ids = new_paper('AB')
+    body = {'test_id': test_id, 'answers': {str(question_ids[0]): 'A', str(question_ids[1]): 'C'}}
+    submission_id = client.post('/submit', json=body, headers=user_headers).get_json()['submission_id']
+    before = view(client, user_headers, submission_id)
+    assert before.get_json()['overall_summary']['correct'] == 1
+
+    response = client.post(f'/tests/{test_id}/regrade', json={'corrections': {str(question_ids[1]): 'C'}},
+                           headers=admin_headers)
+    assert response.status_code == 200
+    assert stored_report(app, submission_id) is None
+
+    after = view(client, user_headers, submission_id, etag=before.headers['ETag'])
+    assert after.status_code == 200
+    assert after.get_json()['overall_summary']['correct'] == 2
+    assert stored_report(app, submission_id) is not None
+
+
+def test_unknown_submission(client, user_headers):
+    assert view(client, user_headers, 999999).status_code == 404
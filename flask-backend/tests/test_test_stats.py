@@ -0,0 +1,78 @@
+"""test_stats kept current by both submit paths without recounting on submit"""
+import json
+
+import db_app
+from conftest import flush_journal
+
+STATS_COLUMNS = ('paper_version', 'submission_count', 'participant_count', 'score_sum', 'score_min', 'score_max',
+                 'histogram', 'score_counts', 'section_correct', 'section_attempted')
+JSON_COLUMNS = ('histogram', 'score_counts', 'section_correct', 'section_attempted')
+
+
+def stats_row(app, test_id):
+    with app.app_context():
+        stats = db_app.db.session.get(db_app.TestStats, test_id)
+        row = {column: getattr(stats, column) for column in STATS_COLUMNS}
+    # JSON columns compare by content; dict key order depends on insertion order
+    return dict(row, **{column: json.loads(row[column]) for column in JSON_COLUMNS if row[column] is not None})
+
+
+def test_serverless_submit_updates_stats_incrementally(app, client, user_headers, admin_headers, new_paper, serverless):
+    test_id, question_ids = new_paper('ABCD')
+    first = client.post('/submit', json={'test_id': test_id, 'answers': {str(question_ids[0]): 'A'}},
+                        headers=user_headers)
+    assert first.status_code == 200
+    flush_journal(app)
+    assert client.get(f'/test-analysis/{test_id}', headers=admin_headers).status_code == 200
+
+    for answers in ({str(question_ids[0]): 'A', str(question_ids[1]): 'B'}, {str(question_ids[2]): 'A'}):
+        status, _ = serverless(user_headers, {'test_id': test_id, 'answers': answers})
+        assert status == 200
+
+    folded = stats_row(app, test_id)
+    assert folded['submission_count'] == 3
+    with app.app_context():
+        test = db_app.db.session.get(db_app.Test, test_id)
+        db_app.rebuild_test_stats(test)
+        db_app.db.session.commit()
+    assert folded == stats_row(app, test_id)
+
+
+def test_serverless_submit_leaves_stale_stats_for_a_rebuild(app, client, user_headers, admin_headers, new_paper, serverless):
+    test_id, question_ids = new_paper('AB')
+    client.post('/submit', json={'test_id': test_id, 'answers': {str(question_ids[0]): 'A'}}, headers=user_headers)
+    flush_journal(app)
+    assert client.get(f'/test-analysis/{test_id}', headers=admin_headers).status_code == 200
+    with app.app_context():
+        db_app.db.session.get(db_app.TestStats, test_id).paper_version = -1
+        db_app.db.session.commit()
+
+    status, _ = serverless(user_headers, {'test_id': test_id, 'answers': {str(question_ids[1]): 'B'}})
+    assert status == 200
+    assert stats_row(app, test_id)['submission_count'] == 1
+
+    assert client.get(f'/test-analysis/{test_id}', headers=admin_headers).status_code == 200
+    assert stats_row(app, test_id)['submission_count'] == 2
+
+
+def test_submit_ranks_without_rebuilding_stale_stats(app, client, user_headers, new_paper, monkeypatch):
+    test_id, question_ids = new_paper('AB')
+    for answer in ('A', 'B'):
+        response = client.post('/submit', json={'test_id': test_id, 'answers': {str(question_ids[0]): answer}},
+                               headers=user_headers)
+        assert response.status_code == 200
+    flush_journal(app)
+    with app.app_context():
+        db_app.db.session.get(db_app.TestStats, test_id).paper_version = -1
+        db_app.db.session.commit()
+        db_app.invalidate_test_caches(test_id)
+
+    def current_test_stats(test):
+        raise AssertionError('submit rebuilt test_stats')
+    monkeypatch.setattr(db_app, 'current_test_stats', current_test_stats)
+    response = client.post('/submit', json={'test_id': test_id, 'answers': {str(question_ids[0]): 'A'}},
+                           headers=user_headers)
+    assert response.status_code == 200
+    # Counted from the two stored submissions, then this one added: tied with the 50% one, ahead of the 0% one
+    assert response.get_json()['ranking'] == {'rank': 1, 'out_of': 3, 'percentile': 66.67}
+    assert stats_row(app, test_id)['paper_version'] == -1
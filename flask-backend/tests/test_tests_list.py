@@ -0,0 +1,59 @@
+"""GET /tests: grouped section and question counts, filters and pagination bounds"""
+import uuid
+
+import pytest
+
+import db_app
+
+
+@pytest.fixture
+def listed_tests(app, new_paper):
+    """(name prefix, ids) of three new tests: four questions, a section without questions, no sections"""
+    # The database is shared by the whole run, so each test lists only its own tests
+    prefix = 'Listing ' + uuid.uuid4().hex[:8]
+    full, _ = new_paper('ABCD', name=prefix + ' 1')
+    with app.app_context():
+        empty_section = db_app.Test(name=prefix + ' 2', description='', duration_minutes=30, is_active=True)
+        no_sections = db_app.Test(name=prefix + ' 3', description='', duration_minutes=30, is_active=False)
+        db_app.db.session.add_all([empty_section, no_sections])
+        db_app.db.session.flush()
+        db_app.db.session.add(db_app.Section(name='Empty', test_id=empty_section.id, order=1))
+        db_app.db.session.commit()
+        return prefix, (full, empty_section.id, no_sections.id)
+
+
+def listing(client, headers, prefix, query=''):
+    response = client.get(f'/tests?search={prefix}{query}', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_counts_and_filters(client, admin_headers, user_headers, listed_tests):
+    prefix, test_ids = listed_tests
+    tests = listing(client, admin_headers, prefix)['tests']
+    assert [(test['id'], test['sections_count'], test['questions_count']) for test in tests] == [
+        (test_ids[0], 1, 4), (test_ids[1], 1, 0), (test_ids[2], 0, 0)
+    ]
+    assert [test['id'] for test in listing(client, admin_headers, prefix, '&is_active=false')['tests']] == [test_ids[2]]
+    # Candidates only ever see active tests
+    assert [test['id'] for test in listing(client, user_headers, prefix)['tests']] == list(test_ids[:2])
+
+
+@pytest.mark.parametrize('query, ids, pagination', [
+    ('&page=1&per_page=2', [0, 1], {'page': 1, 'per_page': 2, 'total': 3, 'pages': 2}),
+    ('&page=2&per_page=2', [2], {'page': 2, 'per_page': 2, 'total': 3, 'pages': 2}),
+    ('&page=3&per_page=2', [], {'page': 3, 'per_page': 2, 'total': 3, 'pages': 2}),
+    ('&page=0&per_page=0', [0], {'page': 1, 'per_page': 1, 'total': 3, 'pages': 3}),
+    ('&page=-4', [0, 1, 2], {'page': 1, 'per_page': db_app.TESTS_PER_PAGE, 'total': 3, 'pages': 1}),
+    ('&page=1&per_page=100000', [0, 1, 2], {'page': 1, 'per_page': db_app.MAX_TESTS_PER_PAGE, 'total': 3, 'pages': 1})
+])
+def test_pagination_bounds(client, admin_headers, listed_tests, query, ids, pagination):
+    prefix, test_ids = listed_tests
+    result = listing(client, admin_headers, prefix, query)
+    assert [test['id'] for test in result['tests']] == [test_ids[index] for index in ids]
+    assert result['pagination'] == pagination
+
+
+def test_no_pagination_without_page(client, admin_headers, listed_tests):
+    prefix, _ = listed_tests
+    assert 'pagination' not in listing(client, admin_headers, prefix, '&per_page=1')
@@ -0,0 +1,45 @@
+"""Revoking a user's tokens when they lose access to a test"""
+import db_app
+from conftest import login
+
+
+def enroll(client, admin_headers, test_id, user_ids, method='POST'):
+    response = client.open(f'/tests/{test_id}/enrollments', method=method, json={'user_ids': user_ids}, headers=admin_headers)
+    assert response.status_code == 200, response.get_json()
+
+
+def test_login_in_the_same_second_as_a_revocation_is_accepted(app, client, admin_headers):
+    response = client.post('/tests', json={'name': 'Revocation test', 'duration_minutes': 30}, headers=admin_headers)
+    test_id = response.get_json()['test']['id']
+    enroll(client, admin_headers, test_id, ['test123'])
+    old_headers = login(client)
+
+    enroll(client, admin_headers, test_id, ['test123'], method='DELETE')
+    new_headers = login(client)
+
+    # Tokens issued within the same second differ only in their version claim
+    assert client.get('/active-tests', headers=old_headers).status_code == 401
+    assert client.get('/active-tests', headers=new_headers).status_code == 200
+
+
+def test_other_processes_see_a_revocation_after_refresh(app, client, admin_headers):
+    response = client.post('/tests', json={'name': 'Refresh test', 'duration_minutes': 30}, headers=admin_headers)
+    test_id = response.get_json()['test']['id']
+    enroll(client, admin_headers, test_id, ['test123'])
+    headers = login(client)
+    enroll(client, admin_headers, test_id, ['test123'], method='DELETE')
+
+    # A process that only has the database to go by
+    db_app._token_revocations.clear()
+    with app.app_context():
+        db_app.refresh_token_revocations(force=True)
+    assert client.get('/active-tests', headers=headers).status_code == 401
+    assert client.get('/active-tests', headers=login(client)).status_code == 200
+
+
+def test_rolled_back_revocation_is_not_cached(app):
+    with app.app_context():
+        db_app.revoke_user_tokens(['nobody-commits-this'])
+        db_app.db.session.rollback()
+        assert 'nobody-commits-this' not in db_app._token_revocations
+        assert db_app.current_token_version('nobody-commits-this') == 0
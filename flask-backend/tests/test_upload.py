@@ -0,0 +1,86 @@
+"""/upload ingests the sample workbooks in chunks, with the optional marking columns"""
+import functools
+import os
+
+import pytest
+from openpyxl import load_workbook
+
+import db_app
+
+SAMPLE_DATA = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, 'sample-data')
+
+
+@pytest.fixture
+def workbooks(tmp_path):
+    """(users, exam) workbook paths; the exam is the sample with marking columns on its Physics sheet"""
+    workbook = load_workbook(os.path.join(SAMPLE_DATA, 'exam_sample.xlsx'))
+    sheet = workbook['Physics']
+    first = sheet.max_column + 1
+    for offset, column in enumerate(('marks', 'negative_marks', 'section_marks', 'section_negative_marks')):
+        sheet.cell(row=1, column=first + offset, value=column)
+    sheet.cell(row=2, column=first, value=4)
+    sheet.cell(row=2, column=first + 1, value=-2)   # negative marks are stored as a deduction
+    sheet.cell(row=2, column=first + 2, value=2)
+    sheet.cell(row=2, column=first + 3, value=1)
+    exam_path = tmp_path / 'exam.xlsx'
+    workbook.save(exam_path)
+    return os.path.join(SAMPLE_DATA, 'users_sample.xlsx'), exam_path
+
+
+def upload(client, headers, test_id, user_path, exam_path):
+    with open(user_path, 'rb') as user_file, open(exam_path, 'rb') as exam_file:
+        return client.post('/upload', headers=headers, content_type='multipart/form-data', data={
+            'test_id': str(test_id),
+            'user_file': (user_file, 'users.xlsx'),
+            'exam_file': (exam_file, 'exam.xlsx')
+        })
+
+
+def uploaded_files(app):
+    folder = app.config['UPLOAD_FOLDER']
+    return os.listdir(folder) if os.path.isdir(folder) else []
+
+
+def test_upload_ingests_in_chunks_with_marking_columns(app, client, admin_headers, new_paper, workbooks, monkeypatch):
+    # Ten questions per sheet in chunks of four: 4 + 4 + 2
+    monkeypatch.setattr(db_app, 'iter_chunks', functools.partial(db_app.iter_chunks, size=4))
+    test_id, _ = new_paper('AB')
+
+    response = upload(client, admin_headers, test_id, *workbooks)
+    assert response.status_code == 200, response.get_json()
+    result = response.get_json()
+    assert (result['sections_count'], result['questions_count']) == (3, 30)
+    assert result['users_count'] + result['users_updated'] == 5
+    assert uploaded_files(app) == []
+
+    with app.app_context():
+        sections = db_app.Section.query.filter_by(test_id=test_id).order_by(db_app.Section.order).all()
+        assert [section.name for section in sections] == ['Physics', 'Chemistry', 'Mathematics']
+        assert (sections[0].marks, sections[0].negative_marks) == (2, 1)
+        assert (sections[1].marks, sections[1].negative_marks) == (None, None)
+        physics = db_app.Question.query.filter_by(section_id=sections[0].id).order_by(db_app.Question.section_order).all()
+        assert [question.section_order for question in physics] == list(range(1, 11))
+        assert (physics[0].marks, physics[0].negative_marks) == (4, 2)
+        assert (physics[1].marks, physics[1].negative_marks) == (None, None)
+        assert physics[0].correct_answer == 'A'
+
+
+def test_upload_rejects_correct_answer_outside_a_to_d(app, client, admin_headers, new_paper, workbooks):
+    users_path, exam_path = workbooks
+    workbook = load_workbook(exam_path)
+    header = [cell.value for cell in workbook['Chemistry'][1]]
+    workbook['Chemistry'].cell(row=4, column=header.index('correct_answer') + 1, value='E')
+    workbook.save(exam_path)
+    test_id, question_ids = new_paper('AB')
+
+    response = upload(client, admin_headers, test_id, users_path, exam_path)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == (
+        "Sheet 'Chemistry', question 3: correct_answer must be A, B, C or D, got 'E'"
+    )
+    assert uploaded_files(app) == []
+    # The paper is left as it was
+    with app.app_context():
+        sections = db_app.Section.query.filter_by(test_id=test_id).all()
+        assert [section.name for section in sections] == ['Section A']
+        assert db_app.Question.query.filter_by(section_id=sections[0].id).count() == len(question_ids)